@@ -21,6 +21,7 @@ a = Analysis(
         'flask',
         'flask_wtf',
         'requests',
+        'github',  # Imported lazily by the share route
         'datetime',
         'glob',
         'json',
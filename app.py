@@ -5,50 +5,154 @@ SMQT Practice Test Application
 A web application for practicing SMQT (Surveyor Minimum Qualifications Test) questions.
 """
 
+import atexit
+import glob
+import hashlib
 import json
+import logging
+import secrets
 import os
-import random
 import sys
-import webbrowser
-import requests
-import glob
-from datetime import datetime
-from typing import Dict, List, Optional, Set, Union
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Set, Union
 import signal
-from functools import wraps
+import operator
+from functools import lru_cache, wraps
 from werkzeug.security import check_password_hash, generate_password_hash
 import threading
 import time
 import shutil
-from github import Github
-from base64 import b64encode
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, session, redirect, url_for, flash, Response, jsonify, send_from_directory
+from flask import Flask, render_template, request, session, redirect, url_for, flash, Response, jsonify, send_from_directory, g, make_response
+from flask import before_render_template, template_rendered
+from markupsafe import Markup
 from flask_wtf.csrf import CSRFProtect, generate_csrf, validate_csrf
+from question_store import open_binary_bank
+from question_db import SqliteQuestionRepository
+from session_store import MemorySessionStore, ServerSideSessionInterface, SqliteSessionStore
+import metrics
+from log_setup import configure_logging
+from fragment_cache import FragmentCache
+from search_index import SearchIndex, tokenize
+from sampler import AdaptiveSampler, StratifiedSampler, parse_blueprint
+from history_store import SqliteHistoryStore, question_key
+from bank_writer import QuestionBankWriter, atomic_write_json
+from backup_store import DEFAULT_RETENTION, BackupStore
+from github_sync import DEFAULT_URL as DEFAULT_SYNC_URL, QuestionSync, apply_diff, content_hash, diff
+from jobs import DEFAULT_WORKERS, JobQueueFull, JobRunner, MemoryJobStore, SqliteJobStore
+
+# Routes are registered at import; configuration, CSRF and the question bank
+# are set up by create_app() so importing this module stays cheap
+app = Flask(__name__)
+csrf = CSRFProtect()
+logger = logging.getLogger('smqt')
+
+def load_config(flask_app: Flask):
+    """Read configuration from the environment (and .env file)."""
+    # Load environment variables from .env file
+    load_dotenv()
+    flask_app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing-only')
+    flask_app.config['SEND_FILE_MAX_AGE_DEFAULT'] = None  # Static files are revalidated unless fingerprinted (see apply_cache_policy)
+    flask_app.config['GITHUB_TOKEN'] = os.getenv('GITHUB_TOKEN')
+    flask_app.config['GITHUB_REPO'] = 'SailboatSteve/SMQT_Practice_Exam'
+    flask_app.config['GITHUB_API_URL'] = os.environ.get('GITHUB_API_URL', 'https://api.github.com')  # Where shared questions are submitted
+    flask_app.config['QUESTIONS_SYNC_URL'] = os.environ.get('QUESTIONS_SYNC_URL', DEFAULT_SYNC_URL)  # Where "Update questions" downloads the shared bank from
+    flask_app.config['QUESTION_BACKEND'] = os.environ.get('QUESTION_BACKEND', 'json')  # 'json', 'binary' (mmap store) or 'sqlite'
+    flask_app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'memory')  # 'memory', 'sqlite' or 'cookie'
+    flask_app.config['SESSION_TTL'] = int(os.environ.get('SESSION_TTL', 8 * 60 * 60))  # Seconds before an idle server-side session expires
+    flask_app.config['JOB_BACKEND'] = os.environ.get('JOB_BACKEND', 'memory')  # Where background job status is kept: 'memory' or 'sqlite'
+    flask_app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', DEFAULT_WORKERS))  # Background jobs (GitHub update/share) run at once
+    flask_app.config['ADMIN_PASSWORD_HASH'] = os.environ.get('ADMIN_PASSWORD_HASH')
+    flask_app.config['KSA_BLUEPRINT'] = parse_blueprint(os.environ.get('KSA_BLUEPRINT'))  # e.g. 'A:12,B:9,...'; default is proportional to the bank
+    flask_app.config['BACKUP_RETENTION'] = int(os.environ.get('BACKUP_RETENTION', DEFAULT_RETENTION))  # Question bank snapshots to keep
+    flask_app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')  # DEBUG, INFO, WARNING or ERROR
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    cookie = request.cookies.get(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    metrics.SESSION_COOKIE_SIZE.observe(len(cookie) if cookie else 0)
 
-# Load environment variables from .env file
-load_dotenv()
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method)
+    return response
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing-only')
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # Disable caching
-app.config['GITHUB_TOKEN'] = os.getenv('GITHUB_TOKEN')
-app.config['GITHUB_REPO'] = 'SailboatSteve/SMQT_Practice_Exam'
-csrf = CSRFProtect(app)
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_starts', []).append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        metrics.TEMPLATE_LATENCY.observe(time.perf_counter() - starts.pop(), template=template.name)
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
+# Fingerprinted static URLs can be cached for a year: a changed file gets a new URL
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+_static_fingerprints: Dict[str, tuple] = {}
 
-# Add no-cache headers to all responses
+def static_fingerprint(filename: str) -> Optional[str]:
+    """Return a short content hash for a static file, or None if it doesn't exist."""
+    path = os.path.join(app.static_folder, filename)
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    cached = _static_fingerprints.get(filename)
+    if cached is None or cached[0] != signature:
+        with open(path, 'rb') as f:
+            cached = (signature, hashlib.sha256(f.read()).hexdigest()[:12])
+        _static_fingerprints[filename] = cached
+    return cached[1]
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = static_fingerprint(values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
+            # Collected while render_cacheable() renders a page
+            used = g.get('static_used')
+            if used is not None:
+                used[values['filename']] = fingerprint
+
+# Pages that are the same for every visitor set their own validators; everything
+# else (exam, results and admin pages) is session-specific and must not be stored
 @app.after_request
-def add_no_cache_headers(response):
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+def apply_cache_policy(response):
+    if request.endpoint == 'static':
+        filename = (request.view_args or {}).get('filename')
+        version = request.args.get('v')
+        if response.status_code == 200 and version and version == static_fingerprint(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
     return response
 
 # Constants
 DEFAULT_NUM_QUESTIONS = 10
 QUESTION_COUNT_OPTIONS = [10, 35, 70, 140]  # Available options for test length
 REGULATIONS_FILE = 'regulations.json'
-ADMIN_PASSWORD_HASH = os.environ.get('ADMIN_PASSWORD_HASH', generate_password_hash('admin'))  # Default password: admin
+
+@lru_cache(maxsize=1)
+def _default_admin_password_hash() -> str:
+    return generate_password_hash('admin')  # Default password: admin
+
+def get_admin_password_hash() -> str:
+    """Return the configured admin password hash, hashing the default lazily."""
+    return app.config.get('ADMIN_PASSWORD_HASH') or _default_admin_password_hash()
 
 def get_data_dir():
     """Get the user data directory for storing modifiable files."""
@@ -81,55 +185,595 @@ def get_questions_file():
             
     return questions_file
 
-# Update the global QUESTIONS_FILE to use the user data directory
-QUESTIONS_FILE = get_questions_file()
+def _file_signature(path: str) -> Optional[tuple]:
+    """Return a cheap change token (mtime, size) for a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class QuestionEditConflict(Exception):
+    """Raised when the question being edited was changed or removed by another process."""
+
+class QuestionBankCache:
+    """Process-wide cache of the parsed question bank.
+
+    The questions file is parsed once and re-read only when its mtime/size
+    changes or when a writer calls invalidate(). The returned list is shared
+    between requests and must be treated as read-only.
+
+    With the 'binary' backend the JSON file is compiled once into a compact
+    mmap-backed store next to it, and the cache hands out that list-like
+    store, which decodes questions one at a time on access. With the
+    'sqlite' backend the repository's write counter replaces the file stat.
+    """
+
+    def __init__(self, path: Optional[str] = None, backend: str = 'json'):
+        self.path = path
+        self.backend = backend
+        self.repository: Optional[SqliteQuestionRepository] = None
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._questions = None
+        self._signature = None
+        self._derived: Dict[str, tuple] = {}
+        # Set while edits held in memory are waiting to be written to disk
+        self._pinned = False
+        # File signature the pinned bank was read from (None after a whole-bank
+        # replace) and the single-question edits made on top of it since, by
+        # position: (content hash of the question it replaced, new question)
+        self._base = None
+        self._edits: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        if self.repository is not None:
+            return ('sqlite', self.repository.questions_version())
+        return _file_signature(self.path)
+
+    def snapshot(self) -> tuple:
+        """Return (version, questions); version is None if the bank failed to load."""
+        signature = self._current_signature()
+        with self._lock:
+            if self._questions is not None and (self._pinned or signature == self._signature):
+                self.hits += 1
+                return self.version, self._questions
+            self.misses += 1
+            questions = self._load(signature)
+            if questions is None:
+                # Keep serving the last good bank rather than an empty one
+                if self._questions is not None:
+                    return self.version, self._questions
+                return None, []
+            self._questions = questions
+            self._signature = signature
+            self._derived.clear()
+            self.version += 1
+            return self.version, questions
+
+    def get(self) -> Sequence[Dict]:
+        return self.snapshot()[1]
+
+    def derived(self, name: Union[str, tuple], builder: Callable):
+        """Return builder(questions), rebuilt only when the bank changes."""
+        version, questions = self.snapshot()
+        entry = self._derived.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = builder(questions)
+        if version is not None:
+            self._derived[name] = (version, value)
+        return value
+
+    def _load(self, signature) -> Optional[Sequence[Dict]]:
+        if self.repository is not None:
+            with metrics.FILE_IO_LATENCY.time(operation='read_questions_db'):
+                return self.repository.load_questions()
+        if self.backend == 'binary' and signature is not None:
+            # One file per version of the JSON: requests still reading the
+            # previous store keep a valid map (released with its last
+            # reference), and Windows never has to replace a mapped file
+            prefix = os.path.splitext(self.path)[0]
+            bin_path = '%s-%d-%d.qbin' % (prefix, *signature)
+            try:
+                with metrics.FILE_IO_LATENCY.time(operation='open_binary_store'):
+                    store = open_binary_bank(self.path, bin_path, signature)
+            except Exception as e:
+                logger.error("Error opening binary question store %s: %s", bin_path, e)
+            else:
+                self._remove_old_stores(prefix, bin_path)
+                return store
+        return _read_questions_file(self.path)
+
+    @staticmethod
+    def _remove_old_stores(prefix: str, keep: str):
+        # Earlier versions and the unversioned file older releases wrote
+        for path in glob.glob(glob.escape(prefix) + '-*.qbin') + [prefix + '.qbin']:
+            if path != keep and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Still mapped on Windows; removed after a later rebuild
+
+    def replace(self, questions: Sequence[Dict]):
+        """Serve an edited bank from memory until mark_written() reports it saved."""
+        with self._lock:
+            self._publish(questions, None, {})
+
+    def _publish(self, questions: Sequence[Dict], base, edits: Dict[int, tuple]):
+        self._questions = questions
+        self._signature = None
+        self._pinned = True
+        self._base = base
+        self._edits = edits
+        self._derived.clear()
+        self.version += 1
+
+    def _reread(self, edits: Dict[int, tuple]) -> Optional[tuple]:
+        """Read the file another process wrote and apply our unwritten edits to it.
+
+        Each edit goes to wherever the question it replaced now is, which may
+        be a different position. An edit whose question was changed or
+        removed in the file is dropped and logged. Returns (questions, edits
+        keyed by their new positions), or None if the file can't be read.
+        """
+        questions = _read_questions_file(self.path)
+        if questions is None:
+            return None
+        positions = {}
+        for i, q in enumerate(questions):
+            positions.setdefault(content_hash(q), i)
+        kept = {}
+        for question_id, (original, question) in edits.items():
+            i = positions.get(original)
+            if i is None:
+                logger.warning("Unsaved edit to question %d dropped: another process changed or "
+                               "removed that question", question_id)
+                continue
+            questions[i] = question
+            kept[i] = (original, question)
+        return questions, kept
+
+    def edit(self, question_id: int, question: Dict) -> bool:
+        """Replace one question and serve the result from memory.
+
+        Call with the bank writer's exclusive lock held, so the bank can't
+        change between the copy and the edit. If another process wrote the
+        file since the pinned bank was read, the edit is made on the file's
+        contents (plus our unwritten edits) instead; True is returned then,
+        as more than this one question may have changed. Raises
+        QuestionEditConflict if the question was changed or removed there.
+        """
+        signature = self._current_signature()
+        with self._lock:
+            pinned, questions = self._pinned, self._questions
+            base, edits = self._base, dict(self._edits)
+        if not pinned:
+            questions = self.get()
+            with self._lock:
+                base, edits = self._signature, {}
+        # Remember which question this replaced, to find it again after a rebase
+        original = edits[question_id][0] if question_id in edits else content_hash(questions[question_id])
+        edits[question_id] = (original, question)
+        rebased = False
+        if pinned and base is not None and signature != base:
+            fresh = self._reread(edits)
+            if fresh is not None:
+                questions, edits = fresh
+                base, rebased = signature, True
+                if not any(edit[1] is question for edit in edits.values()):
+                    raise QuestionEditConflict(
+                        f"Question {question_id + 1} was changed or removed by someone else; reload and try again")
+        if not rebased:
+            questions = list(questions)
+            questions[question_id] = question
+        with self._lock:
+            self._publish(questions, base, edits)
+        return rebased
+
+    def rebase(self, questions: Sequence[Dict]) -> Sequence[Dict]:
+        """Bring a bank about to be written up to date with the file.
+
+        The bank writer calls this with its lock held before a scheduled
+        write, so edits another process saved in the meantime aren't lost.
+        """
+        signature = self._current_signature()
+        with self._lock:
+            if questions is not self._questions or self._base is None or signature == self._base:
+                return questions
+            edits = dict(self._edits)
+        fresh = self._reread(edits)
+        if fresh is None:
+            return questions
+        questions, edits = fresh
+        with self._lock:
+            self._publish(questions, signature, edits)
+        logger.info("Question bank changed on disk; re-applied %d pending edits", len(edits))
+        return questions
+
+    def mark_written(self, questions: Sequence[Dict]):
+        """Adopt the file's new signature once the in-memory bank has been written."""
+        with self._lock:
+            if questions is self._questions:
+                self._signature = self._current_signature()
+                self._pinned = False
+                self._base = None
+                self._edits = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._questions = None
+            self._signature = None
+            self._pinned = False
+            self._base = None
+            self._edits = {}
+
+    def stats(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'version': self.version,
+            'loaded': self._questions is not None,
+            'backend': self.backend,
+        }
+
+question_cache = QuestionBankCache()
+metrics.registry.callback('smqt_question_cache_hits_total', 'counter',
+                          'Question bank cache hits.', lambda: question_cache.hits)
+metrics.registry.callback('smqt_question_cache_misses_total', 'counter',
+                          'Question bank cache misses (file re-parsed).', lambda: question_cache.misses)
+metrics.registry.callback('smqt_question_bank_version', 'gauge',
+                          'Number of times the question bank has been loaded.', lambda: question_cache.version)
+
+# Set by init_question_bank() when the app is created
+QUESTIONS_FILE: Optional[str] = None
+question_repository: Optional[SqliteQuestionRepository] = None
+bank_writer: Optional[QuestionBankWriter] = None
+
+def init_question_bank(backend: str):
+    """Locate (or initialize) the question bank and open the configured backend."""
+    global QUESTIONS_FILE, question_repository, bank_writer
+    # Update the global QUESTIONS_FILE to use the user data directory
+    QUESTIONS_FILE = get_questions_file()
+    question_cache.path = QUESTIONS_FILE
+    question_cache.backend = backend
+    bank_writer = QuestionBankWriter(QUESTIONS_FILE, on_written=question_cache.mark_written,
+                                     prepare=question_cache.rebase)
+    # Scheduled admin edits must reach the disk before the process exits
+    atexit.register(bank_writer.flush)
+
+    # Optional SQLite repository; migrated once from the JSON files on first use
+    if backend == 'sqlite':
+        question_repository = SqliteQuestionRepository(os.path.join(get_user_data_dir(), 'questions.db'))
+        if not question_repository.is_migrated():
+            question_repository.migrate_from_json(QUESTIONS_FILE, REGULATIONS_FILE)
+        question_cache.repository = question_repository
+    question_cache.invalidate()
+
+# Performance history for adaptive tests; opened by create_app()
+history_store: Optional[SqliteHistoryStore] = None
+CANDIDATE_COOKIE = 'smqt_candidate'
+CANDIDATE_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+def init_history_store():
+    global history_store
+    history_store = SqliteHistoryStore(os.path.join(get_user_data_dir(), 'history.db'))
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not session.get('is_admin'):
-            print("Admin check failed - redirecting to login")  # Debug print
+            logger.debug("Admin check failed - redirecting to login")
             if request.is_json:
                 return jsonify({'error': 'Authentication required'}), 401
             return redirect(url_for('admin_login'))
-        print("Admin check passed")  # Debug print
+        logger.debug("Admin check passed")
         return f(*args, **kwargs)
     return decorated_function
 
+@metrics.FILE_IO_LATENCY.timed(operation='write_questions')
 def save_questions(questions):
-    """Save questions to the JSON file."""
-    with open(QUESTIONS_FILE, 'w') as f:
-        json.dump(questions, f, indent=2)
-
-def load_regulations() -> Dict:
-    """Load regulations mapping from the regulations file."""
+    """Save the whole question bank."""
+    if question_repository is not None:
+        question_repository.replace_questions(questions)
+        question_cache.invalidate()
+    else:
+        with bank_writer.exclusive():
+            question_cache.replace(questions)
+            try:
+                bank_writer.write(questions)
+            except Exception:
+                # Don't keep serving a bank that never reached the disk
+                question_cache.invalidate()
+                raise
+
+def update_question(question_id: int, question: Dict):
+    """Replace a single question in the bank.
+
+    For the JSON file the edit is served from memory at once and written
+    shortly after, so a burst of admin edits ends in a single write. The
+    copy, edit and schedule happen under the writer's lock, which other
+    worker processes take too, so concurrent edits can't overwrite each other.
+    """
+    if question_repository is not None:
+        previous_version = question_cache.version
+        question_repository.update_question(question_id, question)
+        question_cache.invalidate()
+    else:
+        with bank_writer.exclusive():
+            previous_version = question_cache.version
+            rebased = question_cache.edit(question_id, question)
+            bank_writer.schedule(question_cache.get())
+        if rebased:
+            return  # Other questions changed too; the search index is rebuilt on next use
+    update_search_index(question_id, question, previous_version)
+
+@metrics.FILE_IO_LATENCY.timed(operation='export_questions')
+def export_questions_json(indent: Optional[int] = None) -> str:
+    """Return the current question bank as JSON text, e.g. for backups."""
+    if question_repository is not None:
+        return question_repository.export_questions_json(indent=indent)
+    separators = (',', ':') if indent is None else None
+    return json.dumps(list(load_questions()), indent=indent, separators=separators, ensure_ascii=False)
+
+@metrics.FILE_IO_LATENCY.timed(operation='read_regulations')
+def _read_regulations_file(path: str) -> Dict:
+    """Parse the regulations file, falling back to an empty mapping."""
     try:
-        with open(REGULATIONS_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except Exception as e:
-        print(f"Error loading regulations: {e}")
+        logger.error("Error loading regulations: %s", e)
         return {"categories": {}, "keywords": {}}
 
-def load_questions() -> List[Dict]:
-    """Load questions from the JSON file."""
+def _expand_ftags(section: str) -> List[str]:
+    """Expand an F-tag section such as 'F550-F586' or 'F895' into single tags."""
+    parts = [p.strip().upper().lstrip('F') for p in (section or '').split('-')]
     try:
-        with open(QUESTIONS_FILE, 'r') as f:
+        numbers = [int(p) for p in parts if p]
+    except ValueError:
+        return []
+    if not numbers:
+        return []
+    start, end = numbers[0], numbers[-1]
+    if end < start or end - start > 500:
+        return [f'F{start}']
+    return [f'F{n}' for n in range(start, end + 1)]
+
+class RegulationsIndex:
+    """Pre-indexed view of regulations.json.
+
+    Gives constant-time lookups from regulation id (e.g. '483.80'), F-tag
+    range ('F550-F586'), single F-tag ('F880') and keyword to regulation
+    entries. Each entry is the regulation dict from the file plus its
+    'category' and 'category_title'.
+    """
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self.by_id: Dict[str, Dict] = {}
+        self.by_section: Dict[str, List[Dict]] = {}
+        self.by_ftag: Dict[str, List[Dict]] = {}
+        self.by_keyword: Dict[str, List[Dict]] = {}
+
+        for category_id, category in data.get('categories', {}).items():
+            for regulation in category.get('regulations', []):
+                entry = dict(regulation)
+                entry['category'] = category_id
+                entry['category_title'] = category.get('title', '')
+                self.by_id[entry['id']] = entry
+                section = entry.get('section')
+                if section:
+                    self.by_section.setdefault(section, []).append(entry)
+                    for tag in _expand_ftags(section):
+                        self.by_ftag.setdefault(tag, []).append(entry)
+
+        for keyword, reg_ids in data.get('keywords', {}).items():
+            self.by_keyword[keyword.lower()] = [self.by_id[r] for r in reg_ids if r in self.by_id]
+
+    def lookup(self, key: str) -> List[Dict]:
+        """Find entries by regulation id, F-tag range, single F-tag or keyword."""
+        if not key:
+            return []
+        key = key.strip()
+        if key in self.by_id:
+            return [self.by_id[key]]
+        if key in self.by_section:
+            return self.by_section[key]
+        if key.upper() in self.by_ftag:
+            return self.by_ftag[key.upper()]
+        return self.by_keyword.get(key.lower(), [])
+
+    def primary_category(self, question: Dict) -> Optional[str]:
+        """Return the category of the first regulation a question references."""
+        for ref in question.get('regulations', []) or []:
+            matches = self.lookup(ref.get('id', '')) or self.lookup(ref.get('section', ''))
+            if matches:
+                return matches[0]['category']
+        return None
+
+    def for_question(self, question: Dict) -> Dict[str, Dict]:
+        """Return only the regulation entries a question references, keyed by id."""
+        found = {}
+        for ref in question.get('regulations', []) or []:
+            matches = self.lookup(ref.get('id', '')) or self.lookup(ref.get('section', ''))
+            for entry in matches:
+                found[entry['id']] = entry
+        return found
+
+_regulations_index: Optional[RegulationsIndex] = None
+_regulations_signature = None
+_regulations_lock = threading.Lock()
+
+@metrics.FUNCTION_LATENCY.timed(function='load_regulations')
+def get_regulations_index() -> RegulationsIndex:
+    """Return the regulations index, rebuilding it if the file has changed."""
+    global _regulations_index, _regulations_signature
+    if question_repository is not None:
+        signature = ('sqlite', question_repository.regulations_version())
+    else:
+        signature = _file_signature(REGULATIONS_FILE)
+    with _regulations_lock:
+        if _regulations_index is None or signature != _regulations_signature:
+            if question_repository is not None:
+                data = question_repository.load_regulations()
+            else:
+                data = _read_regulations_file(REGULATIONS_FILE)
+            _regulations_index = RegulationsIndex(data)
+            _regulations_signature = signature
+        return _regulations_index
+
+def load_regulations() -> Dict:
+    """Load regulations mapping from the regulations file."""
+    return get_regulations_index().data
+
+@metrics.FILE_IO_LATENCY.timed(operation='read_questions')
+def _read_questions_file(path: str) -> Optional[List[Dict]]:
+    """Parse a questions file, returning None if it cannot be read."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
             questions = json.load(f)
             # Handle both formats: array of questions or object with questions array
             if isinstance(questions, list):
                 return questions
             return questions.get('questions', [])
     except Exception as e:
-        print(f"Error loading questions from {QUESTIONS_FILE}: {e}")
-        return []
+        logger.error("Error loading questions from %s: %s", path, e)
+        return None
 
-def get_question_by_id(question_id: int, questions_list: List[Dict]) -> Optional[Dict]:
+@metrics.FUNCTION_LATENCY.timed(function='load_questions')
+def load_questions() -> Sequence[Dict]:
+    """Load questions from the process-wide question bank cache."""
+    return question_cache.get()
+
+# Pre-rendered HTML for the content-only parts of the question and review pages
+fragment_cache = FragmentCache()
+metrics.registry.callback('smqt_fragment_cache_hits_total', 'counter',
+                          'Rendered fragment cache hits.', lambda: fragment_cache.hits)
+metrics.registry.callback('smqt_fragment_cache_misses_total', 'counter',
+                          'Rendered fragment cache misses.', lambda: fragment_cache.misses)
+
+def render_fragment(template_name: str, question: Dict, with_regulations: bool = False) -> Markup:
+    """Render a partial that depends only on the question, reusing cached HTML.
+
+    Fragments are keyed on the question's content, so editing one question
+    leaves the HTML cached for all the others in place.
+    """
+    regulations_index = get_regulations_index() if with_regulations else None
+
+    def render():
+        context = {'question': question}
+        if regulations_index is not None:
+            context['regulations'] = regulations_index.for_question(question)
+        return render_template(template_name, **context)
+
+    key = (template_name, content_hash(question))
+    if with_regulations:
+        # Regulation titles are rendered too, so a regulations change is a new key
+        key += (_regulations_signature,)
+    return Markup(fragment_cache.get_or_render(key, render))
+
+_search_index: Optional[SearchIndex] = None
+_search_lock = threading.Lock()
+
+def get_search_index() -> SearchIndex:
+    """Return the full-text index, rebuilding it if the bank changed underneath it."""
+    global _search_index
+    version, questions = question_cache.snapshot()
+    with _search_lock:
+        if _search_index is None or _search_index.version != version:
+            with metrics.FUNCTION_LATENCY.time(function='build_search_index'):
+                _search_index = SearchIndex(questions, version)
+        return _search_index
+
+def update_search_index(question_id: int, question: Dict, previous_version: Optional[int]):
+    """Apply a single-question edit to the index instead of rebuilding it."""
+    with _search_lock:
+        if _search_index is None or _search_index.version != previous_version:
+            return  # Out of date anyway; rebuilt on next use
+        _search_index.update(question_id, question)
+        _search_index.version = question_cache.snapshot()[0]
+
+def get_question_by_id(question_id: int, questions_list: Sequence[Dict]) -> Optional[Dict]:
     """Get a question by its index from the questions list."""
     try:
         return questions_list[question_id]
     except (IndexError, TypeError):
         return None
 
+def answer_mask(letters) -> int:
+    """Encode answer letters as a bitmask (A=1, B=2, C=4, ...)."""
+    mask = 0
+    for letter in letters:
+        letter = str(letter).strip().upper()
+        if len(letter) == 1 and 'A' <= letter <= 'Z':
+            mask |= 1 << (ord(letter) - 65)
+    return mask
+
+class ScoringIndex:
+    """Answer-key bitmasks for every question in the bank, in bank order."""
+
+    def __init__(self, questions: Sequence[Dict]):
+        self.key_masks = [answer_mask(q.get('correct_answers', [])) for q in questions]
+
+    def grade(self, indices: List[int], user_masks: List[int]) -> List[bool]:
+        """Compare user answer masks against the key masks for the given questions."""
+        size = len(self.key_masks)
+        keys = [self.key_masks[i] if 0 <= i < size else -1 for i in indices]
+        return list(map(operator.eq, keys, user_masks))
+
+def get_scoring_index() -> ScoringIndex:
+    """Return the scoring index for the current question bank."""
+    return question_cache.derived('scoring', ScoringIndex)
+
+def get_sampler() -> tuple:
+    """Return (questions, per-KSA/regulation-category sampler) for the current bank.
+
+    The questions are the snapshot the sampler was built from, so drawn
+    indices always refer to them, even if the bank is reloaded meanwhile.
+    """
+    regulations = get_regulations_index()
+    # Keyed on the regulations file too, since it decides each question's category
+    return question_cache.derived(
+        ('sampler', _regulations_signature),
+        lambda questions: (questions, StratifiedSampler(questions, regulations.primary_category)))
+
+def get_adaptive_sampler() -> tuple:
+    """Return (questions, weak-areas sampler with stable question keys) for the current bank."""
+    return question_cache.derived(
+        'adaptive', lambda questions: (questions, AdaptiveSampler(questions, [question_key(q) for q in questions])))
+
+def _question_regulation_ids(question: Dict) -> List[str]:
+    return sorted({reg.get('id') for reg in question.get('regulations', []) or [] if reg.get('id')})
+
+def new_tally(questions: List[Dict]) -> Dict:
+    """Create the running score for a test made of the given questions.
+
+    Per-KSA and per-regulation entries are [correct, total] pairs; 'graded'
+    remembers each answered question's last outcome so changed answers can
+    be applied as deltas.
+    """
+    tally = {'correct': 0, 'graded': {}, 'ksa': {}, 'regulations': {}}
+    for question in questions:
+        tally['ksa'].setdefault(question.get('ksa') or '?', [0, 0])[1] += 1
+        for reg_id in _question_regulation_ids(question):
+            tally['regulations'].setdefault(reg_id, [0, 0])[1] += 1
+    return tally
+
+def record_answer(tally: Dict, question_id: int, question: Dict, is_correct: bool):
+    """Apply one (possibly changed) answer to the running score."""
+    key = str(question_id)
+    delta = int(is_correct) - int(tally['graded'].get(key, False))
+    tally['graded'][key] = is_correct
+    if not delta:
+        return
+    tally['correct'] += delta
+    tally['ksa'].setdefault(question.get('ksa') or '?', [0, 0])[0] += delta
+    for reg_id in _question_regulation_ids(question):
+        tally['regulations'].setdefault(reg_id, [0, 0])[0] += delta
+
 @app.context_processor
 def inject_globals():
     """Inject global variables and functions into templates."""
@@ -168,8 +812,10 @@ def start_test():
     except ValueError:
         num_questions = DEFAULT_NUM_QUESTIONS
     
-    # Load and shuffle questions
-    all_questions = load_questions()
+    candidate = request.cookies.get(CANDIDATE_COOKIE)
+    adaptive = request.form.get('mode', 'standard') == 'adaptive' and bool(candidate) and history_store is not None
+    # The sampler and the questions it draws from come from the same snapshot
+    all_questions, sampler = get_adaptive_sampler() if adaptive else get_sampler()
     if not all_questions:
         flash('No questions available. Please check the questions file.', 'error')
         return redirect(url_for('index'))
@@ -177,17 +823,47 @@ def start_test():
     # Ensure we don't try to select more questions than available
     num_questions = min(num_questions, len(all_questions))
     
-    # Select random question indices instead of full questions
-    total_questions = len(all_questions)
-    selected_indices = random.sample(range(total_questions), num_questions)
+    if adaptive:
+        # Weighted toward this candidate's weak KSAs, missed and unseen questions
+        selected_indices = sampler.sample(
+            num_questions, history_store.question_stats(candidate), history_store.ksa_stats(candidate))
+    else:
+        # Draw question indices covering KSAs and regulation areas in proportion
+        selected_indices = sampler.sample(num_questions, app.config.get('KSA_BLUEPRINT'))
     
     # Store only indices in session
     session['question_indices'] = selected_indices
     session['current_question'] = 0
     session['answers'] = {}
+    session['tally'] = new_tally([all_questions[i] for i in selected_indices])
     session['start_time'] = datetime.utcnow().isoformat()
+    # A previous test's flag would otherwise keep this one out of the history
+    session.pop('history_recorded', None)
     
-    return redirect(url_for('question', question_id=0))
+    response = redirect(url_for('question', question_id=0))
+    if not candidate:
+        # A long-lived id so results can be remembered across tests
+        response.set_cookie(CANDIDATE_COOKIE, secrets.token_urlsafe(24), max_age=CANDIDATE_COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax')
+    return response
+
+def record_history(indices: List[int], graded: List[bool], answers: Dict):
+    """Add a finished test's answered questions to the candidate's history, once."""
+    candidate = request.cookies.get(CANDIDATE_COOKIE)
+    if not candidate or history_store is None or session.get('history_recorded'):
+        return
+    all_questions, sampler = get_adaptive_sampler()
+    keys = sampler.keys
+    outcomes = []
+    for i, (q_index, is_correct) in enumerate(zip(indices, graded)):
+        if str(i) in answers and q_index < len(keys):
+            outcomes.append((keys[q_index], all_questions[q_index].get('ksa'), is_correct))
+    try:
+        history_store.record(candidate, outcomes)
+    except Exception as e:
+        logger.error("Error recording performance history: %s", e)
+        return
+    session['history_recorded'] = True
 
 
 @app.route('/question/<int:question_id>', methods=['GET', 'POST'])
@@ -211,10 +887,14 @@ def question(question_id: int):
         # Get selected answers (handles multiple selections)
         selected = request.form.getlist('answer')
         
-        # Store answer in session
+        # Store answer in session and grade it into the running score
         if selected:
             session['answers'] = dict(session.get('answers', {}))
             session['answers'][str(question_id)] = selected
+            if 'tally' in session:
+                key_mask = get_scoring_index().key_masks[indices[question_id]]
+                record_answer(session['tally'], question_id, current_question,
+                              answer_mask(selected) == key_mask)
             session.modified = True
         
         # Move to next question or results
@@ -223,15 +903,15 @@ def question(question_id: int):
             return redirect(url_for('results'))
         return redirect(url_for('question', question_id=next_id))
     
-    # Load regulations for reference
-    regulations = load_regulations()
-    
+    # The question text, choices and regulation links come from the fragment
+    # cache; only the progress, navigation and saved answers are rendered here
     return render_template(
         'question.html',
         question=current_question,
         question_id=question_id,
         total_questions=len(indices),
-        regulations=regulations
+        content=render_fragment('_question_content.html', current_question),
+        regulations_html=render_fragment('_question_regulations.html', current_question, with_regulations=True)
     )
 
 
@@ -245,31 +925,30 @@ def results():
     answers = session['answers']
     all_questions = load_questions()
     
-    # Calculate results
+    # Use the running score kept while answering; older sessions are graded
+    # in one pass against the precomputed answer-key bitmasks
     num_questions = len(indices)
-    correct_count = 0
-    question_results = []
+    tally = session.get('tally')
+    if tally is not None:
+        graded = [tally['graded'].get(str(i), False) for i in range(num_questions)]
+        correct_count = tally['correct']
+    else:
+        user_masks = [answer_mask(answers.get(str(i), [])) for i in range(num_questions)]
+        graded = get_scoring_index().grade(indices, user_masks)
+        correct_count = sum(graded)
     
-    for i, q_index in enumerate(indices):
+    record_history(indices, graded, answers)
+    
+    # Only a summary per question; the detailed review is loaded on expand
+    question_results = []
+    for i, (q_index, is_correct) in enumerate(zip(indices, graded)):
         question = get_question_by_id(q_index, all_questions)
         if not question:
             continue
-            
-        user_answers = set(answers.get(str(i), []))
-        correct_answers = set(question['correct_answers'])
-        
-        is_correct = user_answers == correct_answers
-        if is_correct:
-            correct_count += 1
-        
         question_results.append({
+            'question_id': i,
             'question': question['question'],
-            'choices': question['choices'],
-            'user_answers': sorted(list(user_answers)),
-            'correct_answers': sorted(list(correct_answers)),
-            'is_correct': is_correct,
-            'explanation': question['explanation'],
-            'regulations': question.get('regulations', [])
+            'is_correct': is_correct
         })
     
     score = (correct_count / num_questions) * 100 if num_questions > 0 else 0
@@ -278,9 +957,6 @@ def results():
     end_time = datetime.utcnow()
     time_taken = end_time - start_time
     
-    # Load regulations for reference
-    regulations = load_regulations()
-    
     return render_template(
         'results.html',
         score=score,
@@ -288,7 +964,40 @@ def results():
         total_questions=num_questions,
         time_taken=time_taken,
         question_results=question_results,
-        regulations=regulations
+        ksa_breakdown=sorted(tally['ksa'].items()) if tally else [],
+        regulation_breakdown=sorted(tally['regulations'].items()) if tally else []
+    )
+
+
+@app.route('/results/review/<int:question_id>')
+def review_question(question_id: int):
+    """Render the detailed review of one answered question."""
+    if 'question_indices' not in session or 'answers' not in session:
+        return '', 404
+    
+    indices = session['question_indices']
+    if question_id >= len(indices):
+        return '', 404
+    
+    all_questions = load_questions()
+    question = get_question_by_id(indices[question_id], all_questions)
+    if not question:
+        return '', 404
+    
+    user_answers = set(session['answers'].get(str(question_id), []))
+    correct_answers = set(question['correct_answers'])
+    result = {
+        'question': question['question'],
+        'choices': question['choices'],
+        'user_answers': sorted(list(user_answers)),
+        'correct_answers': sorted(list(correct_answers)),
+        'is_correct': answer_mask(user_answers) == answer_mask(correct_answers)
+    }
+    
+    return render_template(
+        '_review_detail.html',
+        result=result,
+        explanation=render_fragment('_review_explanation.html', question, with_regulations=True)
     )
 
 
@@ -297,7 +1006,8 @@ def admin_login():
     """Admin login page."""
     if request.method == 'POST':
         password = request.form.get('password')
-        if check_password_hash(ADMIN_PASSWORD_HASH, password):
+        if check_password_hash(get_admin_password_hash(), password):
+            regenerate_session()
             session['is_admin'] = True
             return redirect(url_for('admin'))
         flash('Invalid password', 'error')
@@ -311,14 +1021,140 @@ def admin_logout():
     return redirect(url_for('index'))
 
 
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 500
+
+def _truncate(text: str, length: int) -> str:
+    return text if len(text) <= length else text[:length - 3].rstrip() + '...'
+
+class AdminQuestionIndex:
+    """Table rows, filter indexes and sort orders for the admin question table.
+
+    Built once per question bank version so each page request only
+    intersects a few id sets and slices a presorted list.
+    """
+
+    SORT_KEYS = {
+        'id': lambda row: row['id'],
+        'ksa': lambda row: (row['ksa'].lower(), row['id']),
+        'question': lambda row: (row['question'].lower(), row['id']),
+        'correct_answers': lambda row: (row['correct_answers'], row['id']),
+    }
+
+    def __init__(self, questions: Sequence[Dict]):
+        self.rows: List[Dict] = []
+        self.by_ksa: Dict[str, Set[int]] = {}
+        self.by_reg_id: Dict[str, Set[int]] = {}
+        self.by_ftag: Dict[str, Set[int]] = {}
+        for i, q in enumerate(questions):
+            ksa = q.get('ksa') or ''
+            self.rows.append({
+                'id': i,
+                'ksa': ksa,
+                'question': _truncate(q.get('question') or '', 100),
+                'correct_answers': ', '.join(q.get('correct_answers') or []),
+            })
+            self.by_ksa.setdefault(ksa.upper(), set()).add(i)
+            for ref in q.get('regulations') or []:
+                if ref.get('id'):
+                    self.by_reg_id.setdefault(str(ref['id']), set()).add(i)
+                for tag in _expand_ftags(ref.get('section', '')):
+                    self.by_ftag.setdefault(tag, set()).add(i)
+        self._orders: Dict[str, List[int]] = {}
+
+    def ksas(self) -> List[str]:
+        return sorted({row['ksa'] for row in self.rows if row['ksa']})
+
+    def order(self, sort: str) -> List[int]:
+        """Return question ids sorted by one column, computed on first use."""
+        if sort not in self._orders:
+            key = self.SORT_KEYS[sort]
+            self._orders[sort] = [row['id'] for row in sorted(self.rows, key=key)]
+        return self._orders[sort]
+
+    def query(self, sort: str = 'id', descending: bool = False, ksa: str = '', ftag: str = '',
+              reg_id: str = '', text: str = '', page: int = 1, per_page: int = ADMIN_PAGE_SIZE) -> Dict:
+        """Filter, sort and return one page of rows."""
+        matches: Optional[Set[int]] = None
+        if not tokenize(text):
+            text = ''  # Only stopwords so far (e.g. while typing "the "): no text filter
+        for value, index in ((ksa.upper(), self.by_ksa), (reg_id, self.by_reg_id), (ftag.upper(), self.by_ftag)):
+            if value:
+                ids = index.get(value, set())
+                matches = ids if matches is None else matches & ids
+        if text.strip():
+            ids = get_search_index().match(text)
+            matches = ids if matches is None else matches & ids
+
+        if sort == 'relevance' and text.strip():
+            ordered = [doc_id for doc_id, _ in get_search_index().search(text, limit=None)]
+        else:
+            ordered = self.order(sort if sort in self.SORT_KEYS else 'id')
+        if descending:
+            ordered = ordered[::-1]
+        if matches is not None:
+            ordered = [i for i in ordered if i in matches]
+
+        total = len(ordered)
+        pages = max(1, -(-total // per_page))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * per_page
+        return {
+            'total': total,
+            'page': page,
+            'pages': pages,
+            'per_page': per_page,
+            'questions': [self.rows[i] for i in ordered[start:start + per_page]],
+        }
+
+def get_admin_index() -> AdminQuestionIndex:
+    return question_cache.derived('admin', AdminQuestionIndex)
+
 @app.route('/admin')
 @admin_required
 def admin():
-    """Admin page for managing questions."""
-    questions = load_questions()
-    regulations = load_regulations()
-    return render_template('admin.html', questions=questions, regulations=regulations)
+    """Admin page for managing questions; the table is filled from /admin/api/questions."""
+    return render_template('admin.html', ksas=get_admin_index().ksas(), page_size=ADMIN_PAGE_SIZE)
 
+@app.route('/admin/api/questions')
+@admin_required
+def admin_questions_api():
+    """Return one page of the admin question table as JSON.
+
+    Query parameters: page, per_page, sort (id, ksa, question,
+    correct_answers, or relevance when searching), order (asc or desc),
+    and the filters ksa, ftag, reg_id and q (full-text search).
+    """
+    args = request.args
+    per_page = min(max(args.get('per_page', ADMIN_PAGE_SIZE, type=int), 1), ADMIN_MAX_PAGE_SIZE)
+    return jsonify(get_admin_index().query(
+        sort=args.get('sort', 'id'),
+        descending=args.get('order') == 'desc',
+        ksa=args.get('ksa', ''),
+        ftag=args.get('ftag', ''),
+        reg_id=args.get('reg_id', ''),
+        text=args.get('q', ''),
+        page=args.get('page', 1, type=int),
+        per_page=per_page,
+    ))
+
+
+@app.route('/admin/api/search')
+@admin_required
+def admin_search_api():
+    """Rank questions against a full-text query (text, choices, explanation, regulations)."""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), ADMIN_MAX_PAGE_SIZE)
+    started = time.perf_counter()
+    index = get_search_index()
+    ranked = index.search(query, limit=limit)
+    took_ms = (time.perf_counter() - started) * 1000
+    rows = get_admin_index().rows
+    return jsonify({
+        'query': query,
+        'took_ms': round(took_ms, 3),
+        'results': [dict(rows[doc_id], score=round(score, 4)) for doc_id, score in ranked if doc_id < len(rows)],
+    })
 
 @app.route('/admin/question/<int:question_id>', methods=['GET', 'POST'])
 @admin_required
@@ -351,8 +1187,11 @@ def edit_question(question_id):
         }
         
         # Update question
-        questions[question_id] = question
-        save_questions(questions)
+        try:
+            update_question(question_id, question)
+        except QuestionEditConflict as e:
+            flash(str(e), 'error')
+            return redirect(url_for('admin'))
         flash('Question updated successfully', 'success')
         return redirect(url_for('admin'))
     
@@ -374,11 +1213,33 @@ def get_question_data(question_id):
     return questions[question_id]
 
 
+@app.route('/admin/cache_stats')
+@admin_required
+def cache_stats():
+    """Report question bank and fragment cache hit/miss counters."""
+    return jsonify({
+        'questions': question_cache.stats(),
+        'fragments': fragment_cache.stats(),
+        'writer': bank_writer.stats() if bank_writer is not None else None,
+        'search': _search_index.stats() if _search_index is not None else None,
+    })
+
+
+@app.route('/admin/metrics')
+@admin_required
+def metrics_endpoint():
+    """Expose request and hot-path timings in Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/quit')
 def quit_app():
     """Gracefully shutdown the Flask application and all related processes."""
     def shutdown():
         time.sleep(2)  # Give time for the goodbye page to load
+        # SIGTERM skips atexit handlers, so write any pending admin edits first
+        if bank_writer is not None:
+            bank_writer.flush()
         os.kill(os.getpid(), signal.SIGTERM)
     
     # Schedule the shutdown
@@ -396,34 +1257,58 @@ def handle_csrf_error(e):
     return redirect(url_for('index'))
 
 
-def update_questions_from_github(target_file=None):
-    """Fetch the latest questions from GitHub and update the local question bank."""
+# Conditional, incremental sync of the shared question bank; created on first use
+question_sync: Optional[QuestionSync] = None
+_question_sync_lock = threading.Lock()
+
+def get_question_sync() -> QuestionSync:
+    global question_sync
+    with _question_sync_lock:
+        if question_sync is None:
+            question_sync = QuestionSync(app.config.get('QUESTIONS_SYNC_URL') or DEFAULT_SYNC_URL,
+                                         os.path.join(get_user_data_dir(), 'sync_state.json'))
+        return question_sync
+
+def update_questions_from_github(target_file=None, progress: Optional[Callable[[str], None]] = None):
+    """Fetch the latest questions from GitHub and apply what changed to the local question bank."""
     if target_file is None:
         target_file = QUESTIONS_FILE
+    progress = progress or (lambda message: None)
         
     try:
-        # Create backup before updating
-        backup_success, backup_result = create_backup()
-        if not backup_success:
-            return False, f"Failed to create backup: {backup_result}"
+        is_bank = target_file == question_cache.path
+        if is_bank:
+            local = list(load_questions())
+        else:
+            local = (_read_questions_file(target_file) or []) if os.path.exists(target_file) else []
+
+        progress("Checking GitHub for new questions")
+        result = get_question_sync().fetch(local)
+        if result['status'] == 'unchanged':
+            return True, "Questions are already up to date."
+
+        # Create backup before updating (there is nothing to back up on first run)
+        if os.path.exists(target_file):
+            progress("Backing up the current questions")
+            backup_success, backup_result = create_backup('github update')
+            if not backup_success:
+                return False, f"Failed to create backup: {backup_result}"
+
+        progress("Applying changes")
+        merged, replaced = apply_diff(local, result['changes'])
+        if not is_bank:
+            atomic_write_json(target_file, merged)
+        elif replaced is None:
+            save_questions(merged)
+        else:
+            # Only existing questions changed; update them one by one
+            for question_id in replaced:
+                update_question(question_id, merged[question_id])
+        result['commit']()
 
-        # Fetch latest questions from GitHub
-        url = "https://raw.githubusercontent.com/SailboatSteve/SMQT_Practice_Exam/main/test_questions.json"
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Parse and validate the JSON
-        new_questions = response.json()
-        
-        # Basic validation that it's a list of questions
-        if not isinstance(new_questions, list):
-            raise ValueError("Invalid question format")
-            
-        # Save the new questions
-        with open(target_file, 'w', encoding='utf-8') as f:
-            json.dump(new_questions, f, indent=2)
-            
-        return True, "Questions updated successfully!"
+        counts = result['counts']
+        return True, (f"Questions updated: {counts['added']} added, {counts['changed']} changed, "
+                      f"{counts['removed']} removed.")
 
     except Exception as e:
         return False, f"Error updating questions: {str(e)}"
@@ -441,43 +1326,82 @@ def update_questions():
         
         try:
             validate_csrf(token)
-            print("CSRF validation passed")
+            logger.debug("CSRF validation passed")
         except Exception as e:
-            print(f"CSRF validation error: {str(e)}")
+            logger.warning("CSRF validation error: %s", e)
             return jsonify({'error': 'Invalid CSRF token'}), 403
 
-        # Update questions
-        success, message = update_questions_from_github()
-        if not success:
-            return jsonify({'error': message}), 500
-
         # Clear the cached questions to force reload
         if 'questions' in session:
             del session['questions']
         if 'question_indices' in session:
             del session['question_indices']
 
-        return jsonify({
-            'success': True,
-            'message': message
-        })
+        return submit_job('update_questions', _run_question_update)
 
     except Exception as e:
-        print(f"Error updating questions: {str(e)}")
+        logger.exception("Error updating questions: %s", e)
         return jsonify({'error': str(e)}), 500
 
+def _run_question_update(progress: Callable[[str], None]) -> Dict:
+    success, message = update_questions_from_github(progress=progress)
+    if not success:
+        raise RuntimeError(message)
+    progress(message)
+    return {'message': message}
+
+_page_cache: Dict[tuple, tuple] = {}
+
+def _template_mtime(*names: str) -> datetime:
+    """Return the newest modification time of the given templates."""
+    folder = os.path.join(app.root_path, app.template_folder)
+    mtimes = [os.path.getmtime(os.path.join(folder, name)) for name in names]
+    return datetime.fromtimestamp(int(max(mtimes)), timezone.utc)
+
+def render_cacheable(template_name: str) -> Response:
+    """Render a page that is the same for every visitor, with ETag/Last-Modified.
+
+    The rendered body is kept until one of its templates or of the static
+    files it links to (by fingerprinted URL) changes, and repeat visits are
+    answered with 304 Not Modified.
+    """
+    if '_flashes' in session:
+        # A pending flash message makes this render visitor-specific
+        return make_response(render_template(template_name))
+    templates_modified = _template_mtime(template_name, 'base.html')
+    key = (template_name, request.script_root)
+    cached = _page_cache.get(key)
+    if (cached is None or cached[0] != templates_modified
+            or any(static_fingerprint(name) != fingerprint for name, fingerprint in cached[1].items())):
+        g.static_used = {}
+        body = render_template(template_name)
+        static = g.pop('static_used')
+        # The body embeds the static fingerprints, but hash them in explicitly too
+        etag = hashlib.sha256((body + json.dumps(static, sort_keys=True)).encode('utf-8')).hexdigest()
+        static_mtimes = [os.path.getmtime(os.path.join(app.static_folder, name)) for name in static]
+        last_modified = max([templates_modified] + [datetime.fromtimestamp(int(mtime), timezone.utc)
+                                                    for mtime in static_mtimes])
+        cached = (templates_modified, static, body, etag, last_modified)
+        _page_cache[key] = cached
+    response = Response(cached[2], mimetype='text/html')
+    response.set_etag(cached[3])
+    response.last_modified = cached[4]
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/download')
 def download():
     """Show download page."""
-    return render_template('download.html')
+    return render_cacheable('download.html')
 
 @app.route('/help')
 def help_page():
     """Show the help page."""
-    return render_template('help.html')
+    return render_cacheable('help.html')
 
 def open_browser():
     """Open the browser after a short delay to ensure Flask is running."""
+    import webbrowser
     time.sleep(1.5)  # Wait for Flask to start
     webbrowser.open('http://127.0.0.1:5000')
 
@@ -486,21 +1410,19 @@ def open_browser():
 def share_questions():
     """Share user's questions by creating a PR on GitHub."""
     try:
-        print("Starting share_questions")  # Debug print
-        print(f"Session: {session}")  # Debug print
+        logger.debug("Starting share_questions")
         
         # Verify CSRF token
         token = request.headers.get('X-CSRFToken')
-        print(f"Got CSRF token: {token}")  # Debug print
         
         if not token:
             return jsonify({'error': 'Missing CSRF token'}), 403
         
         try:
             validate_csrf(token)
-            print("CSRF validation passed")  # Debug print
+            logger.debug("CSRF validation passed")
         except Exception as e:
-            print(f"CSRF validation error: {str(e)}")
+            logger.warning("CSRF validation error: %s", e)
             return jsonify({'error': 'Invalid CSRF token'}), 403
 
         # Get GitHub token
@@ -509,115 +1431,130 @@ def share_questions():
             return jsonify({'error': 'GitHub token not configured'}), 500
 
         # Get user's questions
-        questions_path = os.path.join(get_user_data_dir(), 'test_questions.json')
-        if not os.path.exists(questions_path):
+        if not load_questions():
             return jsonify({'error': 'No questions found to share'}), 404
 
-        with open(questions_path, 'r') as f:
-            content = f.read()
-
-        print("Successfully read questions file")  # Debug print
-
-        # Initialize GitHub
-        g = Github(github_token)
-        repo = g.get_repo(app.config['GITHUB_REPO'])
-
-        # Create a new branch
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        branch_name = f'user_submission_{timestamp}'
-        base_branch = repo.get_branch('main')
-        repo.create_git_ref(f'refs/heads/{branch_name}', base_branch.commit.sha)
-
-        print(f"Created branch: {branch_name}")  # Debug print
-
-        # Create file in submissions directory
-        message = f'User question submission {timestamp}'
-        result = repo.create_file(
-            f'submissions/questions_{timestamp}.json',
-            message,
-            content,
-            branch=branch_name
-        )
-
-        print(f"Created file: {result}")  # Debug print
-
-        # Create pull request
-        pr = repo.create_pull(
-            title=f'Question Pool Submission {timestamp}',
-            body='New question pool submission from a user.',
-            head=branch_name,
-            base='main'
-        )
-
-        print(f"Created PR: {pr.html_url}")  # Debug print
-        return jsonify({'success': True, 'pr_url': pr.html_url})
+        return submit_job('share_questions', share_questions_to_github)
 
     except Exception as e:
-        print(f"Error sharing questions: {str(e)}")
+        logger.exception("Error sharing questions: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# GitHub client for question submissions, reused until the token or repository changes
+_question_submitter = None
+_question_submitter_lock = threading.Lock()
+
+def get_question_submitter():
+    global _question_submitter
+    from github_submit import QuestionSubmitter
+    settings = (app.config.get('GITHUB_TOKEN'), app.config['GITHUB_REPO'], app.config['GITHUB_API_URL'])
+    with _question_submitter_lock:
+        submitter = _question_submitter
+        if submitter is None or (submitter.token, submitter.repo_name, submitter.base_url) != settings:
+            submitter = _question_submitter = QuestionSubmitter(*settings)
+        return submitter
+
+def share_questions_to_github(progress: Callable[[str], None]) -> Dict:
+    """Open a pull request with the questions changed since the last update; runs as a background job."""
+    progress("Comparing with the shared questions")
+    changes = diff(get_question_sync().remote_fingerprint(), list(load_questions()))
+    if not any(changes.values()):
+        message = "Your questions match the shared question bank, so there is nothing new to share."
+        progress(message)
+        return {'pr_url': None, 'message': message}
+    result = get_question_submitter().submit(changes, progress)
+    progress("Pull request created")
+    return result
+
+# Runs GitHub updates and shares off the request thread; created by create_app()
+job_runner: Optional[JobRunner] = None
+
+def init_job_runner(backend: str, workers: int):
+    global job_runner
+    if backend == 'sqlite':
+        store = SqliteJobStore(os.path.join(get_user_data_dir(), 'jobs.db'))
+    else:
+        store = MemoryJobStore()
+    job_runner = JobRunner(store, workers)
+
+def submit_job(kind: str, fn: Callable[..., Optional[Dict]]) -> Response:
+    """Start a background job and answer 202 with where to poll for its status."""
+    try:
+        job = job_runner.submit(kind, fn)
+    except JobQueueFull as e:
+        response = jsonify({'error': f"Too many jobs waiting, try again shortly ({e})"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    status_url = url_for('job_status', job_id=job['id'])
+    response = jsonify({'job_id': job['id'], 'status': job['status'], 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+@app.route('/admin/jobs/<job_id>')
+@admin_required
+def job_status(job_id):
+    """Report a background job's status, progress message and result."""
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 def get_backup_dir():
     """Get the backup directory path, creating it if needed."""
     backup_dir = os.path.join(get_user_data_dir(), 'backups')
-    print(f"Backup directory path: {backup_dir}")
     if not os.path.exists(backup_dir):
-        print(f"Creating backup directory: {backup_dir}")
+        logger.info("Creating backup directory: %s", backup_dir)
         os.makedirs(backup_dir)
     return backup_dir
 
-def create_backup():
-    """Create a backup of the current questions file."""
+# Deduplicated question bank snapshots; opened on first use
+backup_store: Optional[BackupStore] = None
+_backup_store_lock = threading.Lock()
+
+def get_backup_store() -> BackupStore:
+    global backup_store
+    with _backup_store_lock:
+        if backup_store is None:
+            retention = app.config.get('BACKUP_RETENTION', DEFAULT_RETENTION)
+            backup_store = BackupStore(get_backup_dir(), retention)
+        return backup_store
+
+def create_backup(reason: str = ''):
+    """Snapshot the current question bank unless it matches the latest backup."""
     try:
-        print(f"Creating backup... Questions file: {QUESTIONS_FILE}")
-        
-        # Get current questions
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            current_questions = f.read()
-
-        # Create backup filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-        backup_dir = get_backup_dir()
-        print(f"Using backup directory: {backup_dir}")
-        
-        backup_file = os.path.join(backup_dir, f'questions_{timestamp}.json')
-        print(f"Creating backup file: {backup_file}")
-        
-        # Save backup
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            f.write(current_questions)
-            print("Backup file written successfully")
-
-        # Clean up old backups (keep only most recent 3)
-        backup_files = glob.glob(os.path.join(backup_dir, 'questions_*.json'))
-        backup_files.sort(reverse=True)
-        for old_file in backup_files[3:]:
-            print(f"Removing old backup: {old_file}")
-            os.remove(old_file)
-
-        print("Backup creation completed successfully")
-        return True, backup_file
+        questions = json.loads(export_questions_json())
+        summary, created = get_backup_store().snapshot(questions, reason)
+        if created:
+            logger.info("Created backup %s (%d questions, %d new)",
+                        summary['id'], summary['count'], summary['new_blobs'])
+        else:
+            logger.info("Question bank unchanged since backup %s; not creating another", summary['id'])
+        return True, summary['id']
     except Exception as e:
         error_msg = f"Error creating backup: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return False, error_msg
 
 def get_available_backups():
-    """Get list of available backups with timestamps."""
+    """Get list of available backups, newest first."""
     try:
-        backup_files = glob.glob(os.path.join(get_backup_dir(), 'questions_*.json'))
         backups = []
-        for f in sorted(backup_files, reverse=True)[:3]:
-            filename = os.path.basename(f)
-            timestamp = filename.replace('questions_', '').replace('.json', '')
-            date_obj = datetime.strptime(timestamp, '%Y%m%d_%H%M')
+        for entry in get_backup_store().list():
+            created = datetime.fromisoformat(entry['created'])
             backups.append({
-                'file': f,
-                'timestamp': timestamp,
-                'date': date_obj.strftime('%B %d, %Y %I:%M %p')
+                'id': entry['id'],
+                'timestamp': entry['created'],
+                'date': created.strftime('%B %d, %Y %I:%M %p'),
+                'count': entry['count'],
+                'added': entry['added'],
+                'removed': entry['removed'],
+                'reason': entry.get('reason', ''),
             })
         return backups
     except Exception as e:
-        print(f"Error getting backups: {str(e)}")
+        logger.error("Error getting backups: %s", e)
         return []
 
 @app.route('/admin/get_backups', methods=['GET'])
@@ -630,29 +1567,25 @@ def list_backups():
 @app.route('/admin/restore_backup', methods=['POST'])
 @admin_required
 def restore_backup():
-    """Restore questions from a backup file."""
+    """Restore questions from a backup snapshot."""
     try:
         data = request.get_json()
-        backup_file = data.get('backup_file')
-        
-        if not backup_file or not os.path.exists(backup_file):
-            return jsonify({'error': 'Invalid backup file'}), 400
+        backup_id = data.get('backup_id')
+        if not backup_id:
+            return jsonify({'error': 'Invalid backup'}), 400
 
-        # Read backup file
-        with open(backup_file, 'r', encoding='utf-8') as f:
-            backup_content = f.read()
-
-        # Validate JSON
         try:
-            questions = json.loads(backup_content)
-            if not isinstance(questions, list):
-                raise ValueError("Invalid question format")
-        except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid backup file format'}), 400
+            questions = get_backup_store().restore(backup_id)
+        except KeyError:
+            return jsonify({'error': 'Invalid backup'}), 400
+
+        # Keep the bank being replaced so the restore can be undone
+        backup_success, backup_result = create_backup('before restore')
+        if not backup_success:
+            return jsonify({'error': f"Failed to create backup: {backup_result}"}), 500
 
         # Restore backup
-        with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            f.write(backup_content)
+        save_questions(questions)
 
         # Clear session cache
         if 'questions' in session:
@@ -666,11 +1599,113 @@ def restore_backup():
         })
 
     except Exception as e:
-        print(f"Error restoring backup: {str(e)}")
+        logger.exception("Error restoring backup: %s", e)
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
+def regenerate_session():
+    """Give the session a new id, so one fixed by someone else before login can't be elevated."""
+    regenerate = getattr(app.session_interface, 'regenerate', None)
+    if regenerate is not None:
+        regenerate(session)
+
+def configure_sessions(flask_app: Flask):
+    """Install the session backend named by SESSION_BACKEND."""
+    backend = flask_app.config['SESSION_BACKEND']
+    ttl = flask_app.config['SESSION_TTL']
+    # Keep test sessions on the server; their cookie only carries a signed session id
+    if backend == 'memory':
+        flask_app.session_interface = ServerSideSessionInterface(MemorySessionStore(ttl))
+    elif backend == 'sqlite':
+        flask_app.session_interface = ServerSideSessionInterface(
+            SqliteSessionStore(os.path.join(get_user_data_dir(), 'sessions.db'), ttl)
+        )
+
+_app_initialized = False
+
+def create_app(config: Optional[Dict] = None) -> Flask:
+    """Configure and return the application; this is the WSGI entry point.
+
+    Configuration, CSRF protection, sessions, the question bank, the
+    performance history store and the background job runner are set up on
+    the first call only. Later calls return the same app.
+    """
+    global _app_initialized
+    if _app_initialized:
+        return app
+    load_config(app)
+    if config:
+        app.config.update(config)
+    configure_logging(os.path.join(get_user_data_dir(), 'logs'), app.config['LOG_LEVEL'])
+    csrf.init_app(app)
+    configure_sessions(app)
+    init_question_bank(app.config['QUESTION_BACKEND'])
+    init_history_store()
+    init_job_runner(app.config['JOB_BACKEND'], app.config['JOB_WORKERS'])
+    # Build the regulations index once at startup
+    get_regulations_index()
+    _app_initialized = True
+    return app
+
+def run_server(host: str, port: int, threads: int, workers: int):
+    """Serve the app with a production WSGI server instead of the dev server."""
+    load_dotenv()
+    config = {'DEBUG': False}
+    if workers > 1 and os.environ.get('SESSION_BACKEND', 'memory') == 'memory':
+        # In-process sessions can't be shared between worker processes
+        config['SESSION_BACKEND'] = 'sqlite'
+    if workers > 1:
+        # A job's status may be polled from any worker process
+        config['JOB_BACKEND'] = 'sqlite'
+    wsgi_app = create_app(config)
+
+    if workers > 1:
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            sys.exit('Multiple worker processes require gunicorn (pip install gunicorn); '
+                     'use --threads on Windows.')
+
+        class GunicornServer(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'{host}:{port}')
+                self.cfg.set('workers', workers)
+                self.cfg.set('threads', threads)
+
+            def load(self):
+                return wsgi_app
+
+        GunicornServer().run()
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning('waitress is not installed; falling back to the threaded Werkzeug server')
+        from werkzeug.serving import run_simple
+        run_simple(host, port, wsgi_app, threaded=True)
+        return
+    serve(wsgi_app, host=host, port=port, threads=threads)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='SMQT Practice Test')
+    parser.add_argument('--server', action='store_true',
+                        help='Run as a multi-user server (no browser, no debug mode)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind in server mode')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads per process in server mode')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes in server mode (more than 1 requires gunicorn)')
+    args = parser.parse_args()
+
+    if args.server:
+        run_server(args.host, args.port, args.threads, args.workers)
+        return
+
     # Start browser in a separate thread
     threading.Thread(target=open_browser, daemon=True).start()
     # Run Flask app
-    app.run(debug=True, use_reloader=False)  # Disable reloader to prevent multiple browser windows
+    create_app().run(debug=True, use_reloader=False)  # Disable reloader to prevent multiple browser windows
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Content-addressed question bank backups
+
+Each question is stored once as a blob named by the SHA-256 of its content.
+A snapshot is a small manifest listing the blob hashes of the bank in order,
+so a snapshot only adds blobs for the questions that changed since earlier
+ones. A snapshot identical to the latest one is not stored again.
+
+    backups/
+        index.json                  newest-first list of snapshot summaries
+        snapshots/<id>.json         manifest: ordered question hashes
+        objects/<ab>/<hash>.json    one question, compact JSON
+
+Old snapshots beyond the retention limit are dropped, along with blobs no
+remaining snapshot refers to. Changes hold a lock file in the backups
+directory, and the index is re-read under it every time, so worker
+processes sharing the directory don't drop each other's snapshots.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bank_writer import atomic_write_bytes, dumps_compact, file_lock
+
+logger = logging.getLogger('smqt')
+
+DEFAULT_RETENTION = 10
+
+
+def question_hash(question: Dict) -> Tuple[str, bytes]:
+    """Return (hash, canonical bytes) for one question."""
+    data = json.dumps(question, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest(), data
+
+
+class BackupStore:
+    """Deduplicated snapshots of the question bank under one directory."""
+
+    def __init__(self, root: str, retention: int = DEFAULT_RETENTION):
+        self.root = root
+        self.retention = max(1, retention)
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self.index_path = os.path.join(root, 'index.json')
+        self.lock_path = os.path.join(root, '.lock')
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        with self._exclusive():
+            if not os.path.exists(self.index_path):
+                self._write_index([])
+                self._import_legacy()
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            with file_lock(self.lock_path):
+                yield
+
+    # Index
+
+    def _read_index(self) -> List[Dict]:
+        # Not cached: another process may have added snapshots since
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Error reading backup index %s: %s", self.index_path, e)
+            return []
+
+    def _write_index(self, index: List[Dict]) -> None:
+        atomic_write_bytes(self.index_path, json.dumps(index, indent=2).encode('utf-8'))
+
+    def list(self) -> List[Dict]:
+        """Return snapshot summaries, newest first."""
+        # The index is replaced atomically, so reading it needs no lock
+        return self._read_index()
+
+    # Blobs and manifests
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest + '.json')
+
+    def _manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshots_dir, snapshot_id + '.json')
+
+    def _read_manifest(self, snapshot_id: str) -> Dict:
+        with open(self._manifest_path(snapshot_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # Snapshots
+
+    def snapshot(self, questions: Sequence[Dict], reason: str = '',
+                 created: Optional[datetime] = None) -> Tuple[Dict, bool]:
+        """Store a snapshot of the bank.
+
+        Returns (summary, created); created is False when the bank is
+        identical to the latest snapshot, whose summary is returned instead.
+        """
+        with self._exclusive():
+            return self._snapshot(questions, reason, created)
+
+    def _snapshot(self, questions: Sequence[Dict], reason: str,
+                  created: Optional[datetime]) -> Tuple[Dict, bool]:
+        hashes = []
+        blobs = {}
+        for question in questions:
+            digest, data = question_hash(question)
+            hashes.append(digest)
+            blobs[digest] = data
+        bank_hash = hashlib.sha256(''.join(hashes).encode('ascii')).hexdigest()
+
+        index = self._read_index()
+        if index and index[0]['hash'] == bank_hash:
+            return index[0], False
+
+        new_blobs = 0
+        for digest, data in blobs.items():
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write_bytes(path, data)
+                new_blobs += 1
+
+        created = created or datetime.now()
+        snapshot_id = created.strftime('%Y%m%dT%H%M%S%f') + '-' + bank_hash[:8]
+        previous = set(self._read_manifest(index[0]['id'])['questions']) if index else set()
+        current = set(hashes)
+        summary = {
+            'id': snapshot_id,
+            'created': created.isoformat(timespec='seconds'),
+            'hash': bank_hash,
+            'count': len(hashes),
+            'added': len(current - previous),
+            'removed': len(previous - current),
+            'new_blobs': new_blobs,
+            'reason': reason,
+        }
+        atomic_write_bytes(self._manifest_path(snapshot_id),
+                           dumps_compact(dict(summary, questions=hashes)))
+        index = [summary] + index
+        expired = index[self.retention:]
+        self._write_index(index[:self.retention])
+        if expired:
+            self._prune(expired)
+        return summary, True
+
+    def restore(self, snapshot_id: str) -> List[Dict]:
+        """Return the questions of a snapshot, in their original order."""
+        # Held while reading blobs too, so another process can't prune them
+        with self._exclusive():
+            if not any(entry['id'] == snapshot_id for entry in self._read_index()):
+                raise KeyError(snapshot_id)
+            manifest = self._read_manifest(snapshot_id)
+            questions = []
+            for digest in manifest['questions']:
+                with open(self._object_path(digest), 'rb') as f:
+                    questions.append(json.loads(f.read().decode('utf-8')))
+        return questions
+
+    def _prune(self, expired: List[Dict]) -> None:
+        """Delete expired manifests and any blobs only they referenced (lock held)."""
+        for entry in expired:
+            try:
+                os.remove(self._manifest_path(entry['id']))
+            except OSError:
+                pass
+        live = set()
+        for entry in self._read_index():
+            live.update(self._read_manifest(entry['id'])['questions'])
+        removed = 0
+        for path in glob.glob(os.path.join(self.objects_dir, '*', '*.json')):
+            if os.path.splitext(os.path.basename(path))[0] not in live:
+                os.remove(path)
+                removed += 1
+        logger.info("Pruned %d backup snapshots and %d unreferenced questions", len(expired), removed)
+
+    def _import_legacy(self) -> None:
+        """Bring in questions_<timestamp>.json backups written by older versions."""
+        legacy = sorted(glob.glob(os.path.join(self.root, 'questions_*.json')))
+        for path in legacy:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    questions = json.load(f)
+                if isinstance(questions, list):
+                    self._snapshot(questions, 'imported ' + os.path.basename(path),
+                                   datetime.fromtimestamp(os.path.getmtime(path)))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable legacy backup %s: %s", path, e)
@@ -0,0 +1,188 @@
+"""
+Crash-safe question bank writes
+
+Every write goes to a temp file in the same directory, is fsynced and then
+renamed over the target, so readers see either the old file or the new one,
+never a truncated one. Writers are serialized by a lock that also covers
+other processes (e.g. gunicorn workers) through a lock file.
+
+Admin edits tend to arrive in bursts; QuestionBankWriter coalesces them so a
+burst ends in a single compact write of the latest bank. Callers that
+read-modify-write the bank hold exclusive() around the whole sequence, so
+two edits (in this process or another one) can't start from the same copy.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger('smqt')
+
+DEFAULT_DELAY = 0.5
+
+
+def dumps_compact(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write data to a temp file next to path, fsync it and rename it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = None) -> None:
+    """Atomically write data as JSON: compact by default, pretty with indent."""
+    if indent is None:
+        payload = dumps_compact(data)
+    else:
+        payload = json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+    atomic_write_bytes(path, payload)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on the file at path, across processes."""
+    with open(path, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class QuestionBankWriter:
+    """Single writer for a JSON question bank file.
+
+    write() replaces the file immediately; schedule() defers the write by
+    `delay` seconds and keeps only the latest bank, so several edits in a
+    row cost one write. on_written(questions) is called after each write.
+    A deferred write first passes the bank through prepare(questions), with
+    the lock held, so it can be brought up to date with the file.
+    """
+
+    def __init__(self, path: str, delay: float = DEFAULT_DELAY,
+                 on_written: Optional[Callable[[List[Dict]], None]] = None,
+                 prepare: Optional[Callable[[List[Dict]], List[Dict]]] = None):
+        self.path = path
+        self.delay = delay
+        self.on_written = on_written
+        self.prepare = prepare
+        self.writes = 0
+        self.coalesced = 0
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._pending: Optional[List[Dict]] = None
+        self._timer: Optional[threading.Timer] = None
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the in-process lock and an exclusive lock on path + '.lock'.
+
+        Reentrant: only the outermost call takes the file lock, which a
+        second flock() from the same thread would otherwise wait on forever.
+        """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with file_lock(self.path + '.lock'):
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def write(self, questions: List[Dict]) -> None:
+        """Write the bank now, superseding any scheduled write."""
+        with self.exclusive():
+            self._cancel_timer()
+            atomic_write_bytes(self.path, dumps_compact(questions))
+            # Cleared only once written, so a failed write is retried by the next flush
+            self._pending = None
+            self.writes += 1
+            if self.on_written is not None:
+                self.on_written(questions)
+
+    def schedule(self, questions: List[Dict]) -> None:
+        """Write the bank after a short delay, replacing any write already scheduled."""
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = questions
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write any scheduled bank now."""
+        with self.exclusive():
+            pending = self._pending
+            if pending is None:
+                self._cancel_timer()
+                return
+            try:
+                if self.prepare is not None:
+                    pending = self.prepare(pending)
+                self.write(pending)
+            except Exception as e:
+                logger.error("Error writing question bank %s: %s", self.path, e)
+                raise
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            pass  # Already logged; the bank stays pending for the next flush
+
+    @property
+    def pending(self) -> bool:
+        return self._pending is not None
+
+    def stats(self) -> Dict:
+        return {'writes': self.writes, 'coalesced': self.coalesced, 'pending': self.pending}
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+SMQT Load-Test Benchmark
+
+Drives the full candidate flow with real CSRF tokens:
+
+    GET /  ->  POST /start  ->  N x (GET + POST /question/<id>)  ->  GET /results
+
+and reports p50/p95/p99 latency per route plus overall requests/sec, for
+each test length and concurrency level.
+
+By default the app runs in-process through Flask's test client, once per
+storage configuration (question backend x session backend), each in its own
+process so the configurations can't affect each other. Use --url to drive an
+already running server instead (e.g. `python app.py --server`).
+
+Usage:
+    python bench_load.py
+    python bench_load.py --lengths 10 140 --concurrency 1 8 --iterations 5
+    python bench_load.py --configs json/memory binary/memory sqlite/sqlite
+    python bench_load.py --url http://127.0.0.1:5000 --output load.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CONFIGS = ['json/memory', 'binary/memory', 'sqlite/memory', 'json/sqlite', 'json/cookie']
+CSRF_RE = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+class TestClientDriver:
+    """Sends requests through Flask's in-process test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path: str):
+        response = self.client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path: str, data: Dict):
+        response = self.client.post(path, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpDriver:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url: str):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def get(self, path: str):
+        response = self.session.get(self.base_url + path, allow_redirects=False)
+        return response.status_code, response.text
+
+    def post(self, path: str, data: Dict):
+        response = self.session.post(self.base_url + path, data=data, allow_redirects=False)
+        return response.status_code, response.text
+
+
+class Recorder:
+    """Collects per-route latencies from many threads."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def timed(self, route: str, call, *args):
+        start = time.perf_counter()
+        status, body = call(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies.setdefault(route, []).append(elapsed)
+            if status >= 400:
+                self.errors += 1
+        return status, body
+
+
+def _csrf(body: str) -> str:
+    match = CSRF_RE.search(body)
+    return match.group(1) if match else ''
+
+
+def run_flow(driver, recorder: Recorder, length: int) -> None:
+    """Take one complete test of the given length."""
+    _, body = recorder.timed('GET /', driver.get, '/')
+    recorder.timed('POST /start', driver.post, '/start',
+                   {'num_questions': str(length), 'csrf_token': _csrf(body)})
+    for i in range(length):
+        _, body = recorder.timed('GET /question', driver.get, f'/question/{i}')
+        recorder.timed('POST /question', driver.post, f'/question/{i}',
+                       {'answer': ['A'], 'csrf_token': _csrf(body)})
+    recorder.timed('GET /results', driver.get, '/results')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_scenario(make_driver, length: int, concurrency: int, iterations: int) -> Dict:
+    """Run `concurrency` simulated candidates, each taking `iterations` tests."""
+    recorder = Recorder()
+
+    def candidate():
+        driver = make_driver()
+        for _ in range(iterations):
+            run_flow(driver, recorder, length)
+
+    threads = [threading.Thread(target=candidate) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in recorder.latencies.values())
+    routes = {}
+    for route, values in recorder.latencies.items():
+        routes[route] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+        }
+    return {
+        'length': length,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': recorder.errors,
+        'seconds': elapsed,
+        'requests_per_sec': total / elapsed if elapsed else 0,
+        'routes': routes,
+    }
+
+
+def run_scenarios(make_driver, args) -> List[Dict]:
+    # One unrecorded test first so template compilation and cache fills don't count
+    run_flow(make_driver(), Recorder(), min(args.lengths))
+    results = []
+    for length in args.lengths:
+        for concurrency in args.concurrency:
+            results.append(run_scenario(make_driver, length, concurrency, args.iterations))
+    return results
+
+
+def worker(args) -> None:
+    """Run all scenarios in-process for the configuration given by the environment."""
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import app as smqt
+    flask_app = smqt.create_app()
+    flask_app.config['TESTING'] = True
+    results = run_scenarios(lambda: TestClientDriver(flask_app), args)
+    print(json.dumps(results))
+
+
+def run_configuration(config: str, args) -> List[Dict]:
+    """Run the scenarios for one question/session backend pair in a child process."""
+    question_backend, session_backend = config.split('/')
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, APPDATA=data_dir,
+                   QUESTION_BACKEND=question_backend, SESSION_BACKEND=session_backend)
+        command = [sys.executable, os.path.abspath(__file__), '--worker',
+                   '--iterations', str(args.iterations),
+                   '--lengths', *map(str, args.lengths),
+                   '--concurrency', *map(str, args.concurrency)]
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_results(label: str, results: List[Dict]) -> None:
+    print(f"\n== {label} ==")
+    for scenario in results:
+        print(f"\n{scenario['length']} questions, {scenario['concurrency']} concurrent: "
+              f"{scenario['requests_per_sec']:.0f} req/s, {scenario['errors']} errors")
+        print(f"  {'route':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for route, stats in scenario['routes'].items():
+            print(f"  {route:<16}{stats['count']:>7}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the SMQT exam flow')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 35, 70, 140],
+                        help='Test lengths to run (default: 10 35 70 140)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='Concurrent candidates per scenario (default: 1 4 16)')
+    parser.add_argument('--iterations', type=int, default=2,
+                        help='Tests taken by each candidate per scenario (default: 2)')
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                        help='question_backend/session_backend pairs to compare in-process '
+                             f'(default: {" ".join(DEFAULT_CONFIGS)})')
+    parser.add_argument('--url', help='Benchmark a running server instead of the in-process app')
+    parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    report = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'results': {}}
+    if args.url:
+        report['results'][args.url] = run_scenarios(lambda: HttpDriver(args.url), args)
+    else:
+        for config in args.configs:
+            report['results'][config] = run_configuration(config, args)
+
+    for label, results in report['results'].items():
+        print_results(label, results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
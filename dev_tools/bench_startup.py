@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+SMQT Startup Benchmark
+
+Measures app startup in fresh processes so module caches don't skew the
+numbers:
+
+- import time of app.py and create_app() (source tree only)
+- a per-module import breakdown from `python -X importtime` (source tree only)
+- time from process launch to the first byte of a served `/` response
+- peak RSS of the server process up to that first response
+
+Runs against the source tree by default, or against a frozen PyInstaller
+build with --frozen. Results can be written as JSON with --output so they
+can be compared between commits.
+
+Usage:
+    python bench_startup.py --runs 10 --output startup.json
+    python bench_startup.py --frozen ../dist/SMQT_Practice/SMQT_Practice.exe
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_app_ms': (t2 - t1) * 1000}))
+"""
+
+
+def run_probe(env: dict) -> dict:
+    """Import the app in a fresh interpreter and return its timings."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_breakdown(env: dict, top: int) -> List[Dict]:
+    """Return the slowest top-level imports of app.py by cumulative time."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({
+            'module': name.strip(),
+            'depth': depth,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+        })
+    # Depth 1 entries are the modules imported directly by `import app`
+    direct = [m for m in modules if m['depth'] <= 1]
+    direct.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+    return direct[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_kb(proc: subprocess.Popen) -> Optional[int]:
+    """Stop the server and return its peak RSS in KB, if the platform reports it."""
+    proc.terminate()
+    if hasattr(os, 'wait4'):
+        _, _, usage = os.wait4(proc.pid, 0)
+        proc.returncode = 0
+        # ru_maxrss is in bytes on macOS and KB on Linux
+        return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    proc.wait()
+    return None
+
+
+def first_request(command: List[str], env: dict, timeout: float = 60.0) -> Dict:
+    """Launch a server and time how long until `/` returns its first byte."""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(command + ['--server', '--port', str(port)], cwd=REPO_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    psutil_proc = None
+    peak_rss = 0
+    try:
+        import psutil
+        psutil_proc = psutil.Process(proc.pid)
+    except Exception:
+        pass
+
+    ttfb_ms = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if psutil_proc is not None:
+                try:
+                    peak_rss = max(peak_rss, psutil_proc.memory_info().rss // 1024)
+                except Exception:
+                    pass
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited early with code {proc.returncode}")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                conn.request('GET', '/')
+                response = conn.getresponse()
+                response.read(1)
+                ttfb_ms = (time.perf_counter() - start) * 1000
+                conn.close()
+                break
+            except (ConnectionError, OSError):
+                time.sleep(0.01)
+    finally:
+        rss_kb = _peak_rss_kb(proc) if proc.poll() is None else None
+    return {'ttfb_ms': ttfb_ms, 'peak_rss_kb': rss_kb or (peak_rss or None)}
+
+
+def summarize(values: List[float]) -> Dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    return {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SMQT Practice Test startup')
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh processes to time (default: 10)')
+    parser.add_argument('--frozen', help='Path to a frozen build (e.g. dist/SMQT_Practice/SMQT_Practice.exe)')
+    parser.add_argument('--top', type=int, default=15, help='Number of imports to show in the breakdown (default: 15)')
+    parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'target': args.frozen or 'source',
+        'runs': args.runs,
+    }
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Use a throwaway data directory so the real question bank is untouched
+        env = dict(os.environ, APPDATA=data_dir)
+
+        if args.frozen:
+            command = [os.path.abspath(args.frozen)]
+        else:
+            command = [sys.executable, os.path.join(REPO_ROOT, 'app.py')]
+            run_probe(env)  # Warm the OS file cache and initialize the data dir
+            samples = [run_probe(env) for _ in range(args.runs)]
+            results['import_ms'] = summarize([s['import_ms'] for s in samples])
+            results['create_app_ms'] = summarize([s['create_app_ms'] for s in samples])
+            results['imports'] = import_breakdown(env, args.top)
+
+        served = [first_request(command, env) for _ in range(args.runs)]
+        results['ttfb_ms'] = summarize([s['ttfb_ms'] for s in served])
+        results['peak_rss_kb'] = summarize([s['peak_rss_kb'] for s in served])
+
+    print(f"Target: {results['target']} ({results['runs']} runs)")
+    for key in ('import_ms', 'create_app_ms', 'ttfb_ms', 'peak_rss_kb'):
+        stats = results.get(key)
+        if stats:
+            print(f"{key:>14}: median {stats['median']:9.1f}   min {stats['min']:9.1f}   max {stats['max']:9.1f}")
+    if results.get('imports'):
+        print('\nSlowest imports (cumulative ms):')
+        for module in results['imports']:
+            print(f"  {module['cumulative_ms']:8.1f}  {module['module']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
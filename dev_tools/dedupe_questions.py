@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+SMQT Near-Duplicate Question Detector
+
+Finds questions whose text and choices are nearly the same, using MinHash
+signatures and locality-sensitive hashing (LSH) so the whole bank is checked
+in roughly linear time instead of comparing every pair:
+
+1. Each question (text + choices) is reduced to a set of word shingles.
+2. A one-permutation MinHash signature is computed per question.
+3. Signatures are split into bands; questions sharing any band bucket are
+   candidate pairs.
+4. Candidates are confirmed with their exact Jaccard similarity and joined
+   into clusters.
+
+The same index is used by generate_questions.py to reject new questions that
+duplicate ones already in the bank.
+
+Usage:
+    python dedupe_questions.py
+    python dedupe_questions.py --file ../test_questions.json --threshold 0.6 --output dupes.json
+    python dedupe_questions.py --benchmark 10000
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS_FILE = os.path.join('..', 'test_questions.json')  # Path relative to dev_tools
+DEFAULT_THRESHOLD = 0.7
+SHINGLE_SIZE = 2
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MASK64 = (1 << 64) - 1
+EMPTY = MASK64
+
+
+def shingles(question: Dict, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Return hashed word shingles of a question's text and choices."""
+    text = ' '.join([question.get('question') or '', *(question.get('choices') or [])]).lower()
+    # 'Scenario:' prefixes are boilerplate and would make every scenario look alike
+    words = [w for w in TOKEN_RE.findall(text) if w != 'scenario']
+    if len(words) < size:
+        words = words + [''] * (size - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=8).digest(), 'little')
+        for i in range(len(words) - size + 1)
+    }
+
+
+def minhash(hashes: Iterable[int], num_bins: int) -> Optional[Tuple[int, ...]]:
+    """One-permutation MinHash with rotation densification.
+
+    Each shingle hash is assigned to one of num_bins bins and each bin keeps
+    its minimum, so a signature costs one pass over the shingles rather than
+    one pass per hash function. Empty bins borrow the next non-empty bin's
+    value (offset by the distance) so signatures stay comparable.
+    """
+    bins = [EMPTY] * num_bins
+    for h in hashes:
+        # Mix again so the bin index and the value use independent bits
+        h = (h * 0x9E3779B97F4A7C15) & MASK64
+        j = h % num_bins
+        v = h // num_bins
+        if v < bins[j]:
+            bins[j] = v
+    if all(b == EMPTY for b in bins):
+        return None
+    offset = (MASK64 // num_bins) + 1
+    signature = list(bins)
+    for j in range(num_bins):
+        if bins[j] == EMPTY:
+            t = 1
+            while bins[(j + t) % num_bins] == EMPTY:
+                t += 1
+            signature[j] = bins[(j + t) % num_bins] + t * offset
+    return tuple(signature)
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """LSH index of question signatures that can be queried and grown."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, bands: int = NUM_BANDS, rows: int = ROWS_PER_BAND):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self._shingles: List[Set[int]] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        return [signature[b * self.rows:(b + 1) * self.rows] for b in range(self.bands)]
+
+    def _candidates(self, signature: Optional[Tuple[int, ...]]) -> Set[int]:
+        found: Set[int] = set()
+        if signature is None:
+            return found
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def add(self, question: Dict) -> int:
+        """Index a question and return its position."""
+        doc_id = len(self._shingles)
+        question_shingles = shingles(question)
+        self._shingles.append(question_shingles)
+        signature = minhash(question_shingles, self.bands * self.rows)
+        if signature is not None:
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(doc_id)
+        return doc_id
+
+    def find(self, question: Dict) -> List[Tuple[int, float]]:
+        """Return (position, similarity) of indexed questions that near-duplicate this one."""
+        question_shingles = shingles(question)
+        signature = minhash(question_shingles, self.bands * self.rows)
+        matches = []
+        for doc_id in self._candidates(signature):
+            similarity = jaccard(question_shingles, self._shingles[doc_id])
+            if similarity >= self.threshold:
+                matches.append((doc_id, similarity))
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def pairs(self) -> Tuple[List[Tuple[int, int, float]], int]:
+        """Return confirmed near-duplicate pairs and the number of candidates checked."""
+        seen: Set[Tuple[int, int]] = set()
+        confirmed = []
+        for buckets in self._buckets:
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                for i, a in enumerate(members):
+                    for b in members[i + 1:]:
+                        if (a, b) in seen:
+                            continue
+                        seen.add((a, b))
+                        similarity = jaccard(self._shingles[a], self._shingles[b])
+                        if similarity >= self.threshold:
+                            confirmed.append((a, b, similarity))
+        return confirmed, len(seen)
+
+
+def cluster(pairs: Iterable[Tuple[int, int, float]]) -> List[List[int]]:
+    """Join near-duplicate pairs into clusters (connected components)."""
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[int, List[int]] = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: (-len(g), g[0]))
+
+
+def find_duplicates(questions: Sequence[Dict], threshold: float = DEFAULT_THRESHOLD) -> Dict:
+    """Index a whole bank and return its near-duplicate clusters with timings."""
+    timings = {}
+    start = time.perf_counter()
+    index = NearDuplicateIndex(threshold)
+    for question in questions:
+        index.add(question)
+    timings['index_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pairs, candidates = index.pairs()
+    clusters = cluster(pairs)
+    timings['match_s'] = time.perf_counter() - start
+    return {
+        'questions': len(questions),
+        'threshold': threshold,
+        'candidate_pairs': candidates,
+        'duplicate_pairs': len(pairs),
+        'pairs': [{'a': a, 'b': b, 'similarity': round(s, 3)} for a, b, s in sorted(pairs)],
+        'clusters': clusters,
+        'timings': timings,
+    }
+
+
+def synthetic_bank(questions: Sequence[Dict], size: int, duplicate_rate: float = 0.1, seed: int = 0) -> List[Dict]:
+    """Build a large bank for benchmarking: shuffled-word variants plus light rewordings."""
+    rng = random.Random(seed)
+    vocabulary = [w for q in questions for w in (q.get('question') or '').split()]
+    bank: List[Dict] = []
+    while len(bank) < size:
+        if bank and rng.random() < duplicate_rate:
+            # A near duplicate: an existing synthetic question with one word changed
+            source = rng.choice(bank)
+            words = source['question'].split()
+            words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            bank.append(dict(source, question=' '.join(words)))
+        else:
+            source = rng.choice(questions)
+            words = rng.sample(vocabulary, max(8, len((source.get('question') or '').split())))
+            bank.append(dict(source, question=' '.join(words),
+                             choices=[' '.join(rng.sample(vocabulary, 6)) for _ in range(4)]))
+    return bank
+
+
+def load_questions(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_report(questions: Sequence[Dict], report: Dict, limit: int) -> None:
+    print(f"{report['questions']} questions, threshold {report['threshold']}: "
+          f"{len(report['clusters'])} clusters, {report['duplicate_pairs']} duplicate pairs "
+          f"({report['candidate_pairs']} candidates checked)")
+    print(f"Indexed in {report['timings']['index_s'] * 1000:.0f} ms, "
+          f"matched in {report['timings']['match_s'] * 1000:.0f} ms")
+    for group in report['clusters'][:limit]:
+        print(f"\nCluster of {len(group)}:")
+        for doc_id in group:
+            text = (questions[doc_id].get('question') or '')[:100]
+            print(f"  [{doc_id}] {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate SMQT questions')
+    parser.add_argument('--file', default=DEFAULT_QUESTIONS_FILE,
+                        help=f'Question bank to scan (default: {DEFAULT_QUESTIONS_FILE})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Jaccard similarity that counts as a duplicate (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--limit', type=int, default=20, help='Clusters to print (default: 20)')
+    parser.add_argument('--output', help='Write the full report to this JSON file')
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help='Time the detector on a synthetic bank of N questions built from --file')
+    args = parser.parse_args()
+
+    questions = load_questions(args.file)
+    if args.benchmark:
+        questions = synthetic_bank(questions, args.benchmark)
+
+    report = find_duplicates(questions, args.threshold)
+    print_report(questions, report, args.limit)
+    if args.benchmark:
+        all_pairs = len(questions) * (len(questions) - 1) // 2
+        print(f"\nCompared {report['candidate_pairs']} of {all_pairs} possible pairs "
+              f"({100 * report['candidate_pairs'] / max(all_pairs, 1):.3f}%)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
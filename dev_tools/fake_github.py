@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+SMQT Fake GitHub Server
+
+A local stand-in for GitHub, for trying the admin "Update questions" and
+"Share questions" features without touching the real repository.
+
+Raw files: any GET path ending in the questions file name is answered from a
+file on disk, which is re-read on every request, so editing it simulates an
+upstream change. Responses carry an ETag and Last-Modified and honour
+If-None-Match / If-Modified-Since with 304, like raw.githubusercontent.com.
+
+API: under /api/v3, the handful of REST endpoints a question submission uses
+(branches, git trees, commits and refs, pull requests) are kept in memory.
+--fail-first N answers the first N API requests with 502, to exercise the
+client's retries.
+
+Usage:
+    python fake_github.py --file ../test_questions.json --port 8765
+    QUESTIONS_SYNC_URL=http://127.0.0.1:8765/SailboatSteve/SMQT_Practice_Exam/main/test_questions.json \
+    GITHUB_API_URL=http://127.0.0.1:8765/api/v3 GITHUB_TOKEN=fake python ../app.py
+
+The server can also be started in-process with make_server() and
+serve_in_background(), e.g. from a test script.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS_FILE = os.path.join('..', 'test_questions.json')  # Path relative to dev_tools
+DEFAULT_PORT = 8765
+API_PREFIX = '/api/v3'
+
+
+def object_sha(kind: str, data) -> str:
+    return hashlib.sha1((kind + json.dumps(data, sort_keys=True)).encode('utf-8')).hexdigest()
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    server: 'FakeGitHubServer'
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes = b'', headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, data) -> None:
+        self._send(status, json.dumps(data).encode('utf-8'), {'Content-Type': 'application/json; charset=utf-8'})
+
+    def do_GET(self):
+        self.server.requests += 1
+        path = self.path.split('?', 1)[0]
+        if path.startswith(API_PREFIX + '/'):
+            self._api()
+            return
+        if os.path.basename(path) != os.path.basename(self.server.questions_file):
+            self._send(404, b'404: Not Found', {'Content-Type': 'text/plain'})
+            return
+        with open(self.server.questions_file, 'rb') as f:
+            body = f.read()
+        mtime = int(os.path.getmtime(self.server.questions_file))
+        headers = {
+            'ETag': '"%s"' % hashlib.sha256(body).hexdigest(),
+            'Last-Modified': formatdate(mtime, usegmt=True),
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Cache-Control': 'max-age=300',
+        }
+
+        if_none_match = self.headers.get('If-None-Match')
+        if_modified_since = self.headers.get('If-Modified-Since')
+        not_modified = False
+        if if_none_match is not None:
+            not_modified = headers['ETag'] in [tag.strip() for tag in if_none_match.split(',')]
+        elif if_modified_since is not None:
+            try:
+                not_modified = int(parsedate_to_datetime(if_modified_since).timestamp()) >= mtime
+            except (TypeError, ValueError):
+                pass
+        if not_modified:
+            self.server.not_modified += 1
+            self._send(304, headers={'ETag': headers['ETag'], 'Last-Modified': headers['Last-Modified']})
+            return
+        self._send(200, body, headers)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        self.server.requests += 1
+        self._api()
+
+    def _api(self):
+        url = urlsplit(self.path)
+        server = self.server
+        body = {}
+        if self.command == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+        with server.lock:
+            server.api_calls.append((self.command, url.path))
+            if server.fail_next > 0:
+                server.fail_next -= 1
+                self._send_json(502, {'message': 'Server Error'})
+                return
+        if not self.headers.get('Authorization'):
+            self._send_json(401, {'message': 'Requires authentication'})
+            return
+        parts = url.path[len(API_PREFIX):].strip('/').split('/')
+        if len(parts) < 4 or parts[0] != 'repos':
+            self._send_json(404, {'message': 'Not Found'})
+            return
+        repo_url = f'{server.base_url}{API_PREFIX}/repos/{parts[1]}/{parts[2]}'
+        route = '/'.join(parts[3:])
+        with server.lock:
+            status, data = server.handle_api(self.command, route, body, parse_qs(url.query), repo_url)
+        self._send_json(status, data)
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, questions_file: str, fail_first: int = 0):
+        super().__init__(address, FakeGitHubHandler)
+        self.questions_file = questions_file
+        self.requests = 0
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self.api_calls = []
+        self.fail_next = fail_first
+        root_tree = object_sha('tree', [])
+        root_commit = object_sha('commit', {'tree': root_tree})
+        self.trees = {root_tree: []}
+        self.commits = {root_commit: {'sha': root_commit, 'message': 'Initial commit', 'tree': root_tree, 'parents': []}}
+        self.refs = {'heads/main': root_commit}
+        self.pulls = []
+
+    def _commit_json(self, sha: str, repo_url: str) -> dict:
+        commit = self.commits[sha]
+        return {
+            'sha': sha,
+            'url': f'{repo_url}/git/commits/{sha}',
+            'message': commit['message'],
+            'tree': {'sha': commit['tree'], 'url': f'{repo_url}/git/trees/{commit["tree"]}'},
+            'parents': [{'sha': parent} for parent in commit['parents']],
+        }
+
+    def _ref_json(self, ref: str, repo_url: str) -> dict:
+        return {'ref': f'refs/{ref}', 'url': f'{repo_url}/git/refs/{ref}',
+                'object': {'sha': self.refs[ref], 'type': 'commit'}}
+
+    def handle_api(self, method: str, route: str, body: dict, query: dict, repo_url: str):
+        """Answer one repository API request; returns (status, JSON data)."""
+        if method == 'GET' and route.startswith('branches/'):
+            name = route[len('branches/'):]
+            if f'heads/{name}' not in self.refs:
+                return 404, {'message': 'Branch not found'}
+            sha = self.refs[f'heads/{name}']
+            return 200, {'name': name, 'commit': {'sha': sha, 'commit': self._commit_json(sha, repo_url)}}
+        if method == 'GET' and route.startswith('git/refs/'):
+            ref = route[len('git/refs/'):]
+            if ref not in self.refs:
+                return 404, {'message': 'Not Found'}
+            return 200, self._ref_json(ref, repo_url)
+        if method == 'POST' and route == 'git/trees':
+            base = self.trees.get(body.get('base_tree'), [])
+            entries = {entry['path']: entry for entry in base}
+            entries.update({entry['path']: entry for entry in body['tree']})
+            tree = sorted(entries.values(), key=lambda entry: entry['path'])
+            sha = object_sha('tree', tree)
+            self.trees[sha] = tree
+            return 201, {'sha': sha, 'url': f'{repo_url}/git/trees/{sha}',
+                         'tree': [{'path': e['path'], 'mode': e['mode'], 'type': e['type']} for e in tree]}
+        if method == 'POST' and route == 'git/commits':
+            if body['tree'] not in self.trees or any(p not in self.commits for p in body['parents']):
+                return 422, {'message': 'Tree or parent SHA does not exist'}
+            sha = object_sha('commit', body)
+            self.commits[sha] = {'sha': sha, 'message': body['message'], 'tree': body['tree'],
+                                 'parents': body['parents']}
+            return 201, self._commit_json(sha, repo_url)
+        if method == 'POST' and route == 'git/refs':
+            ref = body['ref'][len('refs/'):]
+            if ref in self.refs:
+                return 422, {'message': 'Reference already exists'}
+            if body['sha'] not in self.commits:
+                return 422, {'message': 'Object does not exist'}
+            self.refs[ref] = body['sha']
+            return 201, self._ref_json(ref, repo_url)
+        if route == 'pulls':
+            if method == 'GET':
+                head = (query.get('head') or [''])[0].split(':')[-1]
+                return 200, [pr for pr in self.pulls if not head or pr['head']['ref'] == head]
+            if f'heads/{body["head"]}' not in self.refs:
+                return 422, {'message': 'Validation Failed'}
+            if any(pr['head']['ref'] == body['head'] for pr in self.pulls):
+                return 422, {'message': 'A pull request already exists'}
+            number = len(self.pulls) + 1
+            pr = {'number': number, 'state': 'open', 'title': body['title'], 'body': body.get('body'),
+                  'url': f'{repo_url}/pulls/{number}', 'html_url': f'{self.base_url}/pull/{number}',
+                  'head': {'ref': body['head'], 'sha': self.refs[f'heads/{body["head"]}']},
+                  'base': {'ref': body['base']}}
+            self.pulls.append(pr)
+            return 201, pr
+        return 404, {'message': 'Not Found'}
+
+    def files(self, ref: str) -> dict:
+        """Return {path: content} of the tree a branch points at."""
+        tree = self.trees[self.commits[self.refs[f'heads/{ref}']]['tree']]
+        return {entry['path']: entry.get('content') for entry in tree}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def questions_url(self) -> str:
+        return f'{self.base_url}/SailboatSteve/SMQT_Practice_Exam/main/{os.path.basename(self.questions_file)}'
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url + API_PREFIX
+
+
+def make_server(questions_file: str, host: str = '127.0.0.1', port: int = 0, fail_first: int = 0) -> FakeGitHubServer:
+    """Create a server; port 0 picks a free port."""
+    return FakeGitHubServer((host, port), os.path.abspath(questions_file), fail_first)
+
+
+def serve_in_background(server: FakeGitHubServer) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a question bank and a minimal GitHub API locally')
+    parser.add_argument('--file', default=DEFAULT_QUESTIONS_FILE,
+                        help=f'Question bank to serve (default: {DEFAULT_QUESTIONS_FILE})')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--fail-first', type=int, default=0, metavar='N',
+                        help='Answer the first N API requests with 502 (default: 0)')
+    args = parser.parse_args()
+
+    server = make_server(args.file, args.host, args.port, args.fail_first)
+    print(f"Serving {server.questions_file}")
+    print(f"Set QUESTIONS_SYNC_URL={server.questions_url()}")
+    print(f"Set GITHUB_API_URL={server.api_url} and any GITHUB_TOKEN")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from openai import OpenAI
 import importlib.util
+from dedupe_questions import DEFAULT_THRESHOLD, NearDuplicateIndex
 
 # Load environment variables
 load_dotenv()
@@ -253,7 +254,8 @@ def generate_and_merge_questions(
     model: str = "gpt-3.5-turbo",
     temperature: float = 0.8,
     topics: Optional[List[str]] = None,
-    output_file: str = DEFAULT_OUTPUT_FILE
+    output_file: str = DEFAULT_OUTPUT_FILE,
+    duplicate_threshold: Optional[float] = DEFAULT_THRESHOLD
 ) -> None:
     """
     Generate questions in batches and merge them into the main question bank.
@@ -265,10 +267,19 @@ def generate_and_merge_questions(
         temperature: Temperature parameter for generation.
         topics: Optional list of topics to focus on.
         output_file: Path to the output JSON file.
+        duplicate_threshold: Similarity above which a new question is rejected
+            as a near duplicate of one already in the bank (None to keep all).
     """
     num_batches = math.ceil(total_questions / BATCH_SIZE)
     all_questions = load_existing_questions(output_file)
     initial_count = len(all_questions)
+    rejected = 0
+    
+    duplicates = None
+    if duplicate_threshold is not None:
+        duplicates = NearDuplicateIndex(duplicate_threshold)
+        for q in all_questions:
+            duplicates.add(q)
     
     for batch in range(num_batches):
         remaining = total_questions - (batch * BATCH_SIZE)
@@ -284,6 +295,21 @@ def generate_and_merge_questions(
             topics=topics
         )
         
+        if duplicates is not None:
+            accepted = []
+            for q in new_questions:
+                matches = duplicates.find(q)
+                if matches:
+                    match_id, similarity = matches[0]
+                    logger.warning(f"Skipping near duplicate of question {match_id} "
+                                   f"(similarity {similarity:.2f}): {q.get('question', '')[:80]}")
+                    rejected += 1
+                    continue
+                # Also catches duplicates within the same batch
+                duplicates.add(q)
+                accepted.append(q)
+            new_questions = accepted
+        
         if new_questions:
             all_questions.extend(new_questions)
             save_questions(all_questions, output_file)
@@ -298,6 +324,8 @@ def generate_and_merge_questions(
     
     final_count = len(all_questions)
     logger.info(f"Generation complete. Added {final_count - initial_count} questions.")
+    if rejected:
+        logger.info(f"Rejected {rejected} near-duplicate questions.")
     logger.info(f"Total questions in bank: {final_count}")
 
 
@@ -314,6 +342,10 @@ def main():
                       help=f'Output JSON file (default: {DEFAULT_OUTPUT_FILE})')
     parser.add_argument('--topics', nargs='+',
                       help='Optional list of topics to focus on')
+    parser.add_argument('--duplicate-threshold', type=float, default=DEFAULT_THRESHOLD,
+                      help=f'Reject new questions at least this similar to an existing one (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                      help='Merge new questions without checking for near duplicates')
     
     args = parser.parse_args()
     
@@ -328,7 +360,8 @@ def main():
         model=args.model,
         temperature=args.temperature,
         topics=args.topics,
-        output_file=args.output
+        output_file=args.output,
+        duplicate_threshold=None if args.allow_duplicates else args.duplicate_threshold
     )
 
 
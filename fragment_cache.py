@@ -0,0 +1,59 @@
+"""
+Rendered fragment cache
+
+Holds pre-rendered HTML for the parts of a page that depend only on question
+content (question text, choices, explanation, regulation links). Keys carry
+a hash of the question's content, so an edited question never serves stale
+HTML while the fragments of every other question stay cached; entries for
+old content simply age out.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered HTML fragments.
+
+    Keys are (fragment name, question content hash, ...) tuples.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: tuple, render: Callable[[], str]) -> str:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        # Render outside the lock; two threads may render the same fragment once
+        html = render()
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,172 @@
+"""
+Question submissions to GitHub as a single commit
+
+Sharing questions used to upload the whole bank with the contents API and a
+round trip per step. A submission now contains only the questions that
+differ from the last synced remote (see github_sync), one file each, and is
+written with the Git data API: one tree and one commit on a new branch,
+then a pull request. The GitHub client and repository handle are created
+once and reused, and each call is retried with exponential backoff on
+rate limiting, server errors and dropped connections.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import requests
+from github import Auth, Github, GithubException, InputGitTreeElement
+
+from history_store import question_key
+
+logger = logging.getLogger('smqt')
+
+DEFAULT_BASE_URL = 'https://api.github.com'
+SUBMISSIONS_DIR = 'submissions'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5  # Seconds before the first retry; doubles each time
+RETRY_MAX_DELAY = 8.0
+TIMEOUT = 15
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, GithubException):
+        if error.status in RETRY_STATUSES:
+            return True
+        # Secondary rate limits come back as 403
+        return error.status == 403 and 'rate limit' in json.dumps(error.data or '').lower()
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, 'headers', None) or {}
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def with_retry(call: Callable, description: str, attempts: int = RETRY_ATTEMPTS,
+               backoff: float = RETRY_BACKOFF, sleep: Callable[[float], None] = time.sleep):
+    """Call call() until it succeeds, backing off exponentially (with jitter) between tries."""
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts - 1 or not _retryable(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = min(backoff * 2 ** attempt, RETRY_MAX_DELAY) * (0.5 + random.random() / 2)
+            logger.warning("GitHub %s failed (%s); retrying in %.1fs", description, e, delay)
+            sleep(delay)
+
+
+def submission_files(changes: Dict[str, List[Dict]], folder: str) -> Dict[str, str]:
+    """Return {path: content} for a submission: one file per added or changed question plus a summary."""
+    files = {}
+    summary = {'added': [], 'changed': [], 'removed': [entry['key'] for entry in changes['removed']]}
+    for status in ('added', 'changed'):
+        for question in changes[status]:
+            key = question_key(question)
+            summary[status].append(key)
+            files[f'{folder}/{status}/{key}.json'] = json.dumps(question, indent=2, ensure_ascii=False) + '\n'
+    files[f'{folder}/summary.json'] = json.dumps(summary, indent=2) + '\n'
+    return files
+
+
+class QuestionSubmitter:
+    """Opens pull requests with question changes, reusing one authenticated client."""
+
+    def __init__(self, token: str, repo_name: str, base_url: str = DEFAULT_BASE_URL,
+                 base_branch: str = 'main', sleep: Callable[[float], None] = time.sleep):
+        self.token = token
+        self.repo_name = repo_name
+        self.base_url = base_url
+        self.base_branch = base_branch
+        self.sleep = sleep
+        self._repo = None
+        self._lock = threading.Lock()
+
+    def _get_repo(self):
+        with self._lock:
+            if self._repo is None:
+                # Retries are handled by with_retry, which knows which calls are safe to repeat
+                client = Github(auth=Auth.Token(self.token), base_url=self.base_url,
+                                timeout=TIMEOUT, retry=None)
+                # Lazy: no request until the first real call
+                self._repo = client.get_repo(self.repo_name, lazy=True)
+            return self._repo
+
+    def _call(self, call: Callable, description: str):
+        return with_retry(call, description, sleep=self.sleep)
+
+    def _create_branch(self, repo, ref: str, sha: str) -> None:
+        try:
+            self._call(lambda: repo.create_git_ref(ref, sha), 'create branch')
+        except GithubException as e:
+            # A retried request may have created the branch the first time
+            if e.status != 422 or repo.get_git_ref(ref[len('refs/'):]).object.sha != sha:
+                raise
+
+    def _open_pull(self, repo, title: str, body: str, head: str):
+        try:
+            return self._call(lambda: repo.create_pull(title=title, body=body, head=head, base=self.base_branch),
+                              'create pull request')
+        except GithubException as e:
+            # As with the branch, a retried request may already have opened it
+            if e.status != 422:
+                raise
+            owner = self.repo_name.split('/')[0]
+            existing = list(repo.get_pulls(state='open', head=f'{owner}:{head}'))
+            if not existing:
+                raise
+            return existing[0]
+
+    def submit(self, changes: Dict[str, List[Dict]],
+               progress: Optional[Callable[[str], None]] = None) -> Dict:
+        """Commit the changes to a new branch and open a pull request.
+
+        Returns {'pr_url', 'branch', 'files'}.
+        """
+        progress = progress or (lambda message: None)
+        repo = self._get_repo()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        branch_name = f'user_submission_{timestamp}'
+        files = submission_files(changes, f'{SUBMISSIONS_DIR}/{timestamp}')
+
+        progress("Reading the shared repository")
+        base = self._call(lambda: repo.get_branch(self.base_branch), 'get branch')
+        base_commit = base.commit.commit
+
+        progress(f"Uploading {len(files) - 1} questions")
+        elements = [InputGitTreeElement(path, '100644', 'blob', content=content)
+                    for path, content in files.items()]
+        tree = self._call(lambda: repo.create_git_tree(elements, base_commit.tree), 'create tree')
+        counts = {status: len(entries) for status, entries in changes.items()}
+        message = (f"User question submission {timestamp}\n\n"
+                   f"{counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+        commit = self._call(lambda: repo.create_git_commit(message, tree, [base_commit]), 'create commit')
+
+        progress("Creating a branch")
+        self._create_branch(repo, f'refs/heads/{branch_name}', commit.sha)
+
+        progress("Opening a pull request")
+        pr = self._open_pull(
+            repo,
+            title=f'Question Pool Submission {timestamp}',
+            body=(f"New questions from a user: {counts['added']} added, {counts['changed']} changed, "
+                  f"{counts['removed']} removed.\n\nSee `{SUBMISSIONS_DIR}/{timestamp}/summary.json`."),
+            head=branch_name
+        )
+
+        logger.info("Created PR %s with %d files in one commit", pr.html_url, len(files))
+        return {'pr_url': pr.html_url, 'branch': branch_name, 'files': len(files)}
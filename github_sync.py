@@ -0,0 +1,179 @@
+"""
+Incremental question sync from GitHub
+
+Downloads the shared question bank with conditional requests (If-None-Match /
+If-Modified-Since) over a pooled session, so an unchanged remote costs a
+304 and no parsing. A changed remote is compared question by question with
+the copy fetched last time, and only those changes are applied to the local
+bank. Local admin edits to questions the remote didn't touch are kept.
+
+Questions are matched by a hash of their text (history_store.question_key).
+The validators and the per-question hashes of the last synced remote are kept
+in a small JSON state file next to the question bank. requests is imported
+only when a QuestionSync is created, so importing the diff helpers (and the
+app) doesn't pay for it.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bank_writer import atomic_write_json
+from history_store import question_key
+
+logger = logging.getLogger('smqt')
+
+DEFAULT_URL = 'https://raw.githubusercontent.com/SailboatSteve/SMQT_Practice_Exam/main/test_questions.json'
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+
+def content_hash(question: Dict) -> str:
+    data = json.dumps(question, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(questions: Sequence[Dict]) -> List[Tuple[str, str]]:
+    """Return (question key, content hash) for each question, in order."""
+    return [(question_key(q), content_hash(q)) for q in questions]
+
+
+def diff(base: Sequence[Tuple[str, str]], questions: Sequence[Dict]) -> Dict[str, List[Dict]]:
+    """Compare a fingerprinted base with a new list of questions.
+
+    Returns {'added', 'changed', 'removed'}; added and changed hold the new
+    questions, removed holds {'key': ...} entries.
+    """
+    base_hashes = dict(base)
+    seen = set()
+    added, changed = [], []
+    for question in questions:
+        key = question_key(question)
+        seen.add(key)
+        if key not in base_hashes:
+            added.append(question)
+        elif base_hashes[key] != content_hash(question):
+            changed.append(question)
+    removed = [{'key': key} for key, _ in base if key not in seen]
+    return {'added': added, 'changed': changed, 'removed': removed}
+
+
+def apply_diff(local: Sequence[Dict], changes: Dict[str, List[Dict]]) -> Tuple[List[Dict], Optional[List[int]]]:
+    """Apply a remote diff to the local bank.
+
+    Returns the merged bank and the local indices replaced in place, or None
+    instead of the indices when questions were added or removed. A remote
+    question that isn't in the local bank is appended.
+    """
+    merged = list(local)
+    positions = {question_key(q): i for i, q in enumerate(merged)}
+    replaced = []
+    structural = False
+    for question in changes['changed'] + changes['added']:
+        i = positions.get(question_key(question))
+        if i is None:
+            positions[question_key(question)] = len(merged)
+            merged.append(question)
+            structural = True
+        elif merged[i] != question:
+            merged[i] = question
+            replaced.append(i)
+    removed = {entry['key'] for entry in changes['removed']}
+    if removed:
+        kept = [q for q in merged if question_key(q) not in removed]
+        structural = structural or len(kept) != len(merged)
+        merged = kept
+    return merged, None if structural else replaced
+
+
+class QuestionSync:
+    """Fetches the remote question bank and works out what changed since last time."""
+
+    def __init__(self, url: str, state_path: str, timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.url = url
+        self.state_path = state_path
+        self.timeout = timeout
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Validators for another URL say nothing about this one
+        return state if state.get('url') == self.url else {}
+
+    def _save_state(self, response, remote: Sequence[Dict]) -> None:
+        atomic_write_json(self.state_path, {
+            'url': self.url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'questions': fingerprint(remote),
+        })
+
+    def remote_fingerprint(self) -> List[Tuple[str, str]]:
+        """Return (key, hash) pairs for the last synced remote, fetching it if it was never synced."""
+        with self._lock:
+            state = self._load_state()
+        if 'questions' in state:
+            return [tuple(entry) for entry in state['questions']]
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        remote = response.json()
+        if not isinstance(remote, list):
+            raise ValueError("Invalid question format")
+        return fingerprint(remote)
+
+    def fetch(self, local: Optional[Sequence[Dict]] = None) -> Dict:
+        """Fetch the remote bank and diff it against the last synced copy.
+
+        Returns {'status': 'unchanged'} when nothing changed, otherwise
+        {'status': 'changed', 'remote', 'changes', 'counts', 'commit'}.
+        commit() records the remote as synced and must be called once the
+        changes are applied. local is the base for the first sync, when no
+        remote copy is known.
+        """
+        with self._lock:
+            state = self._load_state()
+            headers = {}
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                logger.info("Remote questions not modified since last sync")
+                return {'status': 'unchanged'}
+            response.raise_for_status()
+
+            remote = response.json()
+            if not isinstance(remote, list):
+                raise ValueError("Invalid question format")
+
+            base = state['questions'] if 'questions' in state else fingerprint(local or [])
+            changes = diff([tuple(entry) for entry in base], remote)
+            counts = {name: len(entries) for name, entries in changes.items()}
+            logger.info("Remote questions: %(added)d added, %(changed)d changed, %(removed)d removed", counts)
+
+        def commit():
+            with self._lock:
+                self._save_state(response, remote)
+
+        if not any(counts.values()):
+            # Same content under new validators (e.g. a re-upload); remember them
+            commit()
+            return {'status': 'unchanged'}
+        return {'status': 'changed', 'remote': remote, 'changes': changes, 'counts': counts, 'commit': commit}
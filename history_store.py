@@ -0,0 +1,108 @@
+"""
+Per-candidate performance history
+
+Records how each candidate did on every question and KSA across tests, in a
+local SQLite file, so adaptive tests can favour weak areas and unseen
+questions. Candidates are identified by an opaque id kept in a long-lived
+cookie; questions by a hash of their text so history survives reordering
+of the bank.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_history (
+    candidate TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (candidate, question_key)
+);
+CREATE TABLE IF NOT EXISTS ksa_history (
+    candidate TEXT NOT NULL,
+    ksa TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    PRIMARY KEY (candidate, ksa)
+);
+"""
+
+
+def question_key(question: Dict) -> str:
+    """Return a stable identifier for a question based on its text."""
+    return hashlib.sha1((question.get('question') or '').encode('utf-8')).hexdigest()[:16]
+
+
+class SqliteHistoryStore:
+    """Per-candidate question and KSA outcome counts in a local SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (e.g. gunicorn workers)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, candidate: str, outcomes: Iterable[Tuple[str, str, bool]]) -> None:
+        """Add one test's (question key, KSA, correct) outcomes to a candidate's history."""
+        now = time.time()
+        questions: Dict[str, list] = {}
+        ksas: Dict[str, list] = {}
+        for key, ksa, correct in outcomes:
+            counts = questions.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += int(bool(correct))
+            counts = ksas.setdefault(ksa or '?', [0, 0])
+            counts[0] += 1
+            counts[1] += int(bool(correct))
+        if not questions:
+            return
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO question_history(candidate, question_key, attempts, correct, last_seen) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT(candidate, question_key) DO UPDATE SET '
+                'attempts = attempts + excluded.attempts, correct = correct + excluded.correct, '
+                'last_seen = excluded.last_seen',
+                [(candidate, key, a, c, now) for key, (a, c) in questions.items()]
+            )
+            conn.executemany(
+                'INSERT INTO ksa_history(candidate, ksa, attempts, correct) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(candidate, ksa) DO UPDATE SET '
+                'attempts = attempts + excluded.attempts, correct = correct + excluded.correct',
+                [(candidate, ksa, a, c) for ksa, (a, c) in ksas.items()]
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def question_stats(self, candidate: str) -> Dict[str, Tuple[int, int]]:
+        """Return {question key: (attempts, correct)} for a candidate."""
+        rows = self._connect().execute(
+            'SELECT question_key, attempts, correct FROM question_history WHERE candidate = ?', (candidate,)
+        )
+        return {key: (attempts, correct) for key, attempts, correct in rows}
+
+    def ksa_stats(self, candidate: str) -> Dict[str, Tuple[int, int]]:
+        """Return {KSA: (attempts, correct)} for a candidate."""
+        rows = self._connect().execute(
+            'SELECT ksa, attempts, correct FROM ksa_history WHERE candidate = ?', (candidate,)
+        )
+        return {ksa: (attempts, correct) for ksa, attempts, correct in rows}
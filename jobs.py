@@ -0,0 +1,258 @@
+"""
+Background jobs for slow admin operations
+
+Updating questions from GitHub and sharing them both wait on the network, so
+they run on a small thread pool instead of in the request thread. Submitting
+a job returns its id at once; the browser then polls the job's status, which
+the job updates as it goes.
+
+Job records live in a store: an in-process dict (the default for the desktop
+app) or a SQLite file, so that any worker process can answer a status poll.
+While a process has jobs queued or running it refreshes their heartbeat;
+a job whose heartbeat stops (its process died or was recycled) is marked
+failed the next time the store is asked about it.
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger('smqt')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_LIMIT = 8
+FINISHED_TTL = 60 * 60  # Seconds a finished job can still be polled
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 6 * HEARTBEAT_INTERVAL  # Seconds without a heartbeat before a job counts as dead
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+def _stale(job: Dict, heartbeat_before: float) -> bool:
+    return job['status'] in ACTIVE and (job.get('heartbeat') or job['created']) < heartbeat_before
+
+
+def _interrupted(job: Dict) -> Dict:
+    return dict(job, status=FAILED, error='Interrupted: the process running it stopped', finished=time.time())
+
+
+class MemoryJobStore:
+    """Job records in a dict, for a single process."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def put(self, job: Dict) -> None:
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def active(self, kind: str) -> Optional[Dict]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job['kind'] == kind and job['status'] in ACTIVE:
+                    return dict(job)
+        return None
+
+    def count_queued(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] == QUEUED)
+
+    def prune(self, finished_before: float) -> None:
+        with self._lock:
+            for job_id in [i for i, job in self._jobs.items()
+                           if job['finished'] is not None and job['finished'] < finished_before]:
+                del self._jobs[job_id]
+
+    def expire(self, heartbeat_before: float) -> None:
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if _stale(job, heartbeat_before):
+                    self._jobs[job_id] = _interrupted(job)
+
+
+class SqliteJobStore:
+    """Job records in a local SQLite file, shared across worker processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, '
+            'finished REAL, data TEXT NOT NULL)'
+        )
+        # Jobs of other workers may still be running; expire() only fails
+        # those whose heartbeat has stopped
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (e.g. gunicorn workers)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, job: Dict) -> None:
+        self._connect().execute(
+            'INSERT OR REPLACE INTO jobs(id, kind, status, finished, data) VALUES (?, ?, ?, ?, ?)',
+            (job['id'], job['kind'], job['status'], job['finished'], json.dumps(job))
+        )
+
+    def active(self, kind: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT data FROM jobs WHERE kind = ? AND status IN ('queued', 'running') LIMIT 1", (kind,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count_queued(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def prune(self, finished_before: float) -> None:
+        self._connect().execute('DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?', (finished_before,))
+
+    def expire(self, heartbeat_before: float) -> None:
+        conn = self._connect()
+        for (data,) in conn.execute("SELECT data FROM jobs WHERE status IN ('queued', 'running')").fetchall():
+            job = json.loads(data)
+            if _stale(job, heartbeat_before):
+                job = _interrupted(job)
+                # Only if the owner hasn't written the job since we read it
+                conn.execute('UPDATE jobs SET status = ?, finished = ?, data = ? WHERE id = ? AND data = ?',
+                             (job['status'], job['finished'], json.dumps(job), job['id'], data))
+
+
+class JobRunner:
+    """Runs jobs on a bounded thread pool and records their progress in a store.
+
+    At most `workers` jobs run at once per process and at most `queue_limit`
+    wait for a free thread; beyond that submit() raises JobQueueFull. Only
+    one job of each kind is active at a time: submitting another returns
+    the one already queued or running. A background thread refreshes the
+    heartbeat of this process's unfinished jobs every HEARTBEAT_INTERVAL.
+    """
+
+    def __init__(self, store, workers: int = DEFAULT_WORKERS, queue_limit: int = DEFAULT_QUEUE_LIMIT):
+        self.store = store
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        # This process's unfinished jobs, by id; guarded by _save_lock
+        self._jobs: Dict[str, Dict] = {}
+        self._save_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Pool threads don't survive a fork, so each worker process starts its own
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='smqt-job')
+            self._pid = os.getpid()
+            self._jobs = {}
+            threading.Thread(target=self._heartbeat, name='smqt-job-heartbeat', daemon=True).start()
+        return self._executor
+
+    def _save(self, job: Dict) -> None:
+        with self._save_lock:
+            job['heartbeat'] = time.time()
+            self.store.put(job)
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._save_lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                try:
+                    self._save(job)
+                except Exception as e:
+                    logger.warning("Could not refresh heartbeat of job %s: %s", job['id'], e)
+
+    def submit(self, kind: str, fn: Callable[..., Optional[Dict]], *args) -> Dict:
+        """Queue fn(progress, *args) and return the job record.
+
+        progress(message) updates the job's status message. fn's return value
+        becomes the job's result; an exception marks the job failed.
+        """
+        with self._lock:
+            now = time.time()
+            self.store.prune(now - FINISHED_TTL)
+            self.store.expire(now - STALE_AFTER)
+            existing = self.store.active(kind)
+            if existing is not None:
+                return existing
+            if self.store.count_queued() >= self.queue_limit:
+                raise JobQueueFull(f"{self.queue_limit} jobs are already waiting")
+            job = {
+                'id': secrets.token_urlsafe(12),
+                'kind': kind,
+                'status': QUEUED,
+                'message': 'Waiting to start',
+                'result': None,
+                'error': None,
+                'created': now,
+                'started': None,
+                'finished': None,
+                'heartbeat': now,
+            }
+            executor = self._get_executor()
+            with self._save_lock:
+                self._jobs[job['id']] = job
+            self._save(job)
+            executor.submit(self._run, job, fn, args)
+            return dict(job)
+
+    def _run(self, job: Dict, fn: Callable[..., Optional[Dict]], args) -> None:
+        def progress(message: str) -> None:
+            job['message'] = message
+            self._save(job)
+
+        job.update(status=RUNNING, started=time.time())
+        progress('Started')
+        try:
+            result = fn(progress, *args)
+            job.update(status=SUCCEEDED, result=result)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed: %s", job['id'], job['kind'], e)
+            job.update(status=FAILED, error=str(e))
+        job['finished'] = time.time()
+        with self._save_lock:
+            self._jobs.pop(job['id'], None)
+        self._save(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        # A job whose worker died would otherwise poll as running forever
+        self.store.expire(time.time() - STALE_AFTER)
+        return self.store.get(job_id)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
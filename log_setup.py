@@ -0,0 +1,108 @@
+"""
+Application logging
+
+Request threads only put log records on an in-memory queue; a background
+listener thread formats them and writes them to a rotating log file (and to
+stderr). Loggers are configured with a level, so disabled debug calls cost a
+single level check and never format their arguments.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s %(levelname)-7s [%(process)d:%(threadName)s] %(name)s: %(message)s'
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 5
+
+
+class _ForkSafeQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that restarts the listener in a forked worker process.
+
+    The listener thread does not survive a fork (e.g. gunicorn workers), so
+    the first record logged in a new process starts a fresh one.
+    """
+
+    def __init__(self, pipeline: '_LogPipeline'):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.pipeline.pid != os.getpid():
+            self.pipeline.restart()
+        self.queue.put_nowait(record)
+
+
+class _LogPipeline:
+    """The queue plus the background listener that drains it."""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.lock = threading.Lock()
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.pid = None
+
+    def start(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def restart(self) -> None:
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Records queued by the parent before the fork belong to the parent
+            self.queue = queue.SimpleQueue()
+            self.start()
+            for handler in logging.getLogger('smqt').handlers:
+                if isinstance(handler, _ForkSafeQueueHandler):
+                    handler.queue = self.queue
+
+    def stop(self) -> None:
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+        self.listener = None
+
+
+_pipeline: Optional[_LogPipeline] = None
+
+
+def configure_logging(log_dir: str, level: str = 'INFO', console: bool = True) -> logging.Logger:
+    """Route the 'smqt' logger through a queue to a rotating file in log_dir.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _pipeline
+    logger = logging.getLogger('smqt')
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if _pipeline is not None:
+        return logger
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, 'smqt.log'), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except OSError as e:
+        sys.stderr.write(f"Could not open log file in {log_dir}: {e}\n")
+    if console:
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+    _pipeline = _LogPipeline(handlers)
+    _pipeline.start()
+    logger.addHandler(_ForkSafeQueueHandler(_pipeline))
+    # Records are written by the listener, not by the root logger's handlers
+    logger.propagate = False
+    atexit.register(_pipeline.stop)
+    return logger
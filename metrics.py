@@ -0,0 +1,134 @@
+"""
+Lightweight request instrumentation
+
+Histograms and callback metrics rendered in the Prometheus text exposition
+format. Recording an observation is a bisect plus two additions under a lock,
+so it is cheap enough to leave on in production.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple, extra: str = '') -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A labelled histogram with fixed bucket bounds."""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels) -> Callable:
+        """Decorator that observes the wrapped function's duration."""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds histograms and callback metrics and renders them all."""
+
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+        self._callbacks: List[Tuple[str, str, str, Callable]] = []
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple = LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def callback(self, name: str, metric_type: str, documentation: str, fn: Callable) -> None:
+        """Register a counter/gauge whose value is read from fn() at scrape time."""
+        self._callbacks.append((name, metric_type, documentation, fn))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for name, metric_type, documentation, fn in self._callbacks:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'smqt_request_duration_seconds', 'Time spent handling a request, by route and method.')
+FUNCTION_LATENCY = registry.histogram(
+    'smqt_function_duration_seconds', 'Time spent in hot-path functions.')
+TEMPLATE_LATENCY = registry.histogram(
+    'smqt_template_render_seconds', 'Time spent rendering each template.')
+FILE_IO_LATENCY = registry.histogram(
+    'smqt_file_io_seconds', 'Time spent reading and writing data files, by operation.')
+SESSION_COOKIE_SIZE = registry.histogram(
+    'smqt_session_cookie_bytes', 'Size of the session cookie sent with each request.', SIZE_BUCKETS)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+SQLite question repository
+
+An optional storage layer for the question bank and regulations. Questions
+are stored one row each (keyed by their position in the bank, which is the
+question id used throughout the app), so an admin edit is a single-row
+UPDATE instead of a rewrite of the whole JSON file. The database runs in WAL
+mode so readers never block behind a writer.
+
+Usage:
+    python question_db.py migrate questions.db test_questions.json regulations.json
+    python question_db.py export questions.db test_questions.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    ksa TEXT,
+    correct_count INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_ksa ON questions(ksa);
+CREATE INDEX IF NOT EXISTS idx_questions_correct_count ON questions(correct_count);
+
+CREATE TABLE IF NOT EXISTS question_regulations (
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    reg_id TEXT,
+    section TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_question_regulations_question ON question_regulations(question_id);
+CREATE INDEX IF NOT EXISTS idx_question_regulations_reg_id ON question_regulations(reg_id);
+CREATE INDEX IF NOT EXISTS idx_question_regulations_section ON question_regulations(section);
+
+CREATE TABLE IF NOT EXISTS regulation_categories (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS regulations (
+    id TEXT PRIMARY KEY,
+    category TEXT NOT NULL REFERENCES regulation_categories(id),
+    position INTEGER NOT NULL,
+    section TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_regulations_section ON regulations(section);
+
+CREATE TABLE IF NOT EXISTS regulation_keywords (
+    keyword TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    reg_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_regulation_keywords_keyword ON regulation_keywords(keyword);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class SqliteQuestionRepository:
+    """Question and regulation storage backed by a SQLite database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (e.g. gunicorn workers)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Run a block inside a single-writer (BEGIN IMMEDIATE) transaction."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _bump(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (key,)
+        )
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def questions_version(self) -> int:
+        """A counter that changes whenever any question is written."""
+        return int(self._meta('questions_version') or 0)
+
+    def regulations_version(self) -> int:
+        """A counter that changes whenever any regulation is written."""
+        return int(self._meta('regulations_version') or 0)
+
+    # Questions
+
+    def _store_question(self, conn: sqlite3.Connection, question_id: int, question: Dict) -> None:
+        conn.execute(
+            'INSERT OR REPLACE INTO questions(id, ksa, correct_count, data) VALUES (?, ?, ?, ?)',
+            (question_id, question.get('ksa'), len(question.get('correct_answers', [])), _dumps(question))
+        )
+        conn.execute('DELETE FROM question_regulations WHERE question_id = ?', (question_id,))
+        conn.executemany(
+            'INSERT INTO question_regulations(question_id, reg_id, section) VALUES (?, ?, ?)',
+            [(question_id, reg.get('id'), reg.get('section')) for reg in question.get('regulations', []) or []]
+        )
+
+    def count_questions(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+
+    def load_questions(self) -> List[Dict]:
+        rows = self._connect().execute('SELECT data FROM questions ORDER BY id').fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def get_question(self, question_id: int) -> Optional[Dict]:
+        row = self._connect().execute('SELECT data FROM questions WHERE id = ?', (question_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_question(self, question_id: int, question: Dict) -> bool:
+        """Replace one question in place. Returns False if it does not exist."""
+        with self._write() as conn:
+            if conn.execute('SELECT 1 FROM questions WHERE id = ?', (question_id,)).fetchone() is None:
+                return False
+            self._store_question(conn, question_id, question)
+            self._bump(conn, 'questions_version')
+        return True
+
+    def insert_question(self, question: Dict) -> int:
+        """Append a question to the bank and return its id."""
+        with self._write() as conn:
+            question_id = conn.execute('SELECT COALESCE(MAX(id) + 1, 0) FROM questions').fetchone()[0]
+            self._store_question(conn, question_id, question)
+            self._bump(conn, 'questions_version')
+        return question_id
+
+    def replace_questions(self, questions: List[Dict]) -> None:
+        """Replace the whole bank, e.g. after a GitHub update or restore."""
+        with self._write() as conn:
+            conn.execute('DELETE FROM question_regulations')
+            conn.execute('DELETE FROM questions')
+            for question_id, question in enumerate(questions):
+                self._store_question(conn, question_id, question)
+            self._bump(conn, 'questions_version')
+
+    def find_questions(self, ksa: Optional[str] = None, reg_id: Optional[str] = None,
+                       section: Optional[str] = None, correct_count: Optional[int] = None) -> List[int]:
+        """Return ids of questions matching all of the given indexed filters."""
+        sql = 'SELECT DISTINCT q.id FROM questions q'
+        where, params = [], []
+        if reg_id is not None or section is not None:
+            sql += ' JOIN question_regulations r ON r.question_id = q.id'
+        if ksa is not None:
+            where.append('q.ksa = ?')
+            params.append(ksa)
+        if reg_id is not None:
+            where.append('r.reg_id = ?')
+            params.append(reg_id)
+        if section is not None:
+            where.append('r.section = ?')
+            params.append(section)
+        if correct_count is not None:
+            where.append('q.correct_count = ?')
+            params.append(correct_count)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY q.id'
+        return [row[0] for row in self._connect().execute(sql, params)]
+
+    def export_questions_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.load_questions(), indent=indent)
+
+    # Regulations
+
+    def load_regulations(self) -> Dict:
+        """Rebuild the regulations.json document from the database."""
+        conn = self._connect()
+        categories = {}
+        for category_id, title in conn.execute('SELECT id, title FROM regulation_categories ORDER BY position'):
+            categories[category_id] = {'title': title, 'regulations': []}
+        for category_id, data in conn.execute('SELECT category, data FROM regulations ORDER BY position'):
+            categories[category_id]['regulations'].append(json.loads(data))
+        keywords = {}
+        for keyword, reg_id in conn.execute('SELECT keyword, reg_id FROM regulation_keywords ORDER BY rowid'):
+            keywords.setdefault(keyword, []).append(reg_id)
+        return {'categories': categories, 'keywords': keywords}
+
+    def get_regulation(self, reg_id: str) -> Optional[Dict]:
+        row = self._connect().execute('SELECT data FROM regulations WHERE id = ?', (reg_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store_regulation(self, conn: sqlite3.Connection, category: str, position: int, regulation: Dict) -> None:
+        conn.execute(
+            'INSERT OR REPLACE INTO regulations(id, category, position, section, data) VALUES (?, ?, ?, ?, ?)',
+            (regulation['id'], category, position, regulation.get('section'), _dumps(regulation))
+        )
+
+    def update_regulation(self, regulation: Dict) -> bool:
+        """Replace one regulation in place. Returns False if it does not exist."""
+        with self._write() as conn:
+            row = conn.execute('SELECT category, position FROM regulations WHERE id = ?',
+                               (regulation['id'],)).fetchone()
+            if row is None:
+                return False
+            self._store_regulation(conn, row[0], row[1], regulation)
+            self._bump(conn, 'regulations_version')
+        return True
+
+    def insert_regulation(self, category: str, regulation: Dict, category_title: Optional[str] = None) -> None:
+        """Add a regulation to a category, creating the category if needed."""
+        with self._write() as conn:
+            if conn.execute('SELECT 1 FROM regulation_categories WHERE id = ?', (category,)).fetchone() is None:
+                position = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM regulation_categories').fetchone()[0]
+                conn.execute('INSERT INTO regulation_categories(id, position, title) VALUES (?, ?, ?)',
+                             (category, position, category_title or category))
+            position = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM regulations').fetchone()[0]
+            self._store_regulation(conn, category, position, regulation)
+            self._bump(conn, 'regulations_version')
+
+    def replace_regulations(self, data: Dict) -> None:
+        """Replace all regulations with the contents of a regulations.json document."""
+        with self._write() as conn:
+            conn.execute('DELETE FROM regulation_keywords')
+            conn.execute('DELETE FROM regulations')
+            conn.execute('DELETE FROM regulation_categories')
+            position = 0
+            for cat_position, (category_id, category) in enumerate(data.get('categories', {}).items()):
+                conn.execute('INSERT INTO regulation_categories(id, position, title) VALUES (?, ?, ?)',
+                             (category_id, cat_position, category.get('title', '')))
+                for regulation in category.get('regulations', []):
+                    self._store_regulation(conn, category_id, position, regulation)
+                    position += 1
+            conn.executemany(
+                'INSERT INTO regulation_keywords(keyword, position, reg_id) VALUES (?, ?, ?)',
+                [(keyword, i, reg_id)
+                 for keyword, reg_ids in data.get('keywords', {}).items()
+                 for i, reg_id in enumerate(reg_ids)]
+            )
+            self._bump(conn, 'regulations_version')
+
+    # Migration
+
+    def is_migrated(self) -> bool:
+        return self._meta('migrated') is not None
+
+    def migrate_from_json(self, questions_file: str, regulations_file: Optional[str] = None) -> int:
+        """One-shot import of the JSON question bank (and regulations). Returns the count."""
+        with open(questions_file, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+        if not isinstance(questions, list):
+            questions = questions.get('questions', [])
+        self.replace_questions(questions)
+        if regulations_file:
+            with open(regulations_file, 'r', encoding='utf-8') as f:
+                self.replace_regulations(json.load(f))
+        with self._write() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('migrated', ?)", (questions_file,))
+        return len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the SQLite question repository')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='Import test_questions.json (and regulations.json)')
+    migrate.add_argument('database')
+    migrate.add_argument('questions')
+    migrate.add_argument('regulations', nargs='?')
+    export = subparsers.add_parser('export', help='Export the question bank as JSON')
+    export.add_argument('database')
+    export.add_argument('target')
+    args = parser.parse_args()
+
+    repo = SqliteQuestionRepository(args.database)
+    if args.command == 'migrate':
+        count = repo.migrate_from_json(args.questions, args.regulations)
+        print(f"Imported {count} questions into {args.database}")
+    else:
+        with open(args.target, 'w', encoding='utf-8') as f:
+            f.write(repo.export_questions_json())
+        print(f"Exported {repo.count_questions()} questions to {args.target}")
+
+
+if __name__ == '__main__':
+    main()
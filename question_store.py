@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Compact binary question store
+
+An alternative on-disk format for the question bank. Each question is stored
+as a compact JSON record, preceded by a fixed header and an offset index, so
+a single question can be decoded straight out of an mmap without parsing the
+whole bank.
+
+Layout (little-endian):
+    header   magic (8s) | count (I) | source mtime_ns (q) | source size (q)
+    index    (count + 1) x uint64 absolute record offsets
+    records  UTF-8 compact JSON, one per question
+
+The source mtime/size of the JSON file a store was built from is recorded in
+the header so callers can tell when the store is stale. test_questions.json
+remains the interchange format; use the converters below (or the CLI) to go
+between the two.
+
+Usage:
+    python question_store.py to-binary test_questions.json test_questions.qbin
+    python question_store.py to-json test_questions.qbin test_questions.json
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple
+
+MAGIC = b'SMQTQB01'
+HEADER = struct.Struct('<8sIqq')
+OFFSET = struct.Struct('<Q')
+
+
+class BinaryQuestionStore(Sequence):
+    """Read-only, list-like view over a binary question store file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{path} is too small to be a question store")
+        magic, self._count, mtime_ns, size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a question store")
+        self.source_signature = (mtime_ns, size)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('question index out of range')
+        pos = HEADER.size + index * OFFSET.size
+        start, = OFFSET.unpack_from(self._mm, pos)
+        end, = OFFSET.unpack_from(self._mm, pos + OFFSET.size)
+        return json.loads(self._mm[start:end].decode('utf-8'))
+
+    def close(self):
+        self._mm.close()
+
+
+def _atomic_write_bytes(path: str, chunks) -> None:
+    """Write chunks to a temp file next to path and rename it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.qbin-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_binary_store(questions: List[Dict], path: str,
+                       source_signature: Tuple[int, int] = (0, 0)) -> None:
+    """Write questions to path in the binary store format."""
+    records = [
+        json.dumps(q, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        for q in questions
+    ]
+    offset = HEADER.size + (len(records) + 1) * OFFSET.size
+    index = bytearray()
+    for record in records:
+        index += OFFSET.pack(offset)
+        offset += len(record)
+    index += OFFSET.pack(offset)
+
+    header = HEADER.pack(MAGIC, len(records), *source_signature)
+    _atomic_write_bytes(path, [header, bytes(index), *records])
+
+
+def read_json_questions(path: str) -> List[Dict]:
+    """Read a questions JSON file (array or {"questions": [...]})."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return data.get('questions', [])
+
+
+def json_to_binary(json_path: str, bin_path: str) -> int:
+    """Convert a questions JSON file to a binary store. Returns the count."""
+    st = os.stat(json_path)
+    questions = read_json_questions(json_path)
+    write_binary_store(questions, bin_path, (st.st_mtime_ns, st.st_size))
+    return len(questions)
+
+
+def binary_to_json(bin_path: str, json_path: str, indent: Optional[int] = 2) -> int:
+    """Convert a binary store back to a questions JSON file. Returns the count."""
+    store = BinaryQuestionStore(bin_path)
+    try:
+        questions = list(store)
+    finally:
+        store.close()
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(questions, f, indent=indent)
+    return len(questions)
+
+
+def open_binary_bank(json_path: str, bin_path: str,
+                     source_signature: Tuple[int, int]) -> BinaryQuestionStore:
+    """Open the binary store for json_path, rebuilding it if it is stale."""
+    try:
+        store = BinaryQuestionStore(bin_path)
+        if store.source_signature == tuple(source_signature):
+            return store
+        store.close()
+    except (OSError, ValueError):
+        pass
+    questions = read_json_questions(json_path)
+    write_binary_store(questions, bin_path, source_signature)
+    return BinaryQuestionStore(bin_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between JSON and binary question stores')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    to_binary = subparsers.add_parser('to-binary', help='Convert a JSON question file to a binary store')
+    to_binary.add_argument('source')
+    to_binary.add_argument('target')
+    to_json = subparsers.add_parser('to-json', help='Convert a binary store to a JSON question file')
+    to_json.add_argument('source')
+    to_json.add_argument('target')
+    args = parser.parse_args()
+
+    if args.command == 'to-binary':
+        count = json_to_binary(args.source, args.target)
+    else:
+        count = binary_to_json(args.source, args.target)
+    print(f"Wrote {count} questions to {args.target}")
+
+
+if __name__ == '__main__':
+    main()
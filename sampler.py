@@ -0,0 +1,257 @@
+"""
+Stratified test sampler
+
+Questions are grouped once per question bank version into strata by KSA and
+regulation category. Each test is then drawn by giving every stratum its
+share of the requested length and picking that many questions from it, so a
+test covers the KSAs (and regulation areas) in the same proportions as the
+blueprint without rescanning the bank.
+"""
+
+import random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+UNCATEGORIZED = 'uncategorized'
+
+
+def parse_blueprint(spec: Optional[str]) -> Optional[Dict[str, float]]:
+    """Parse 'A:12,B:9,...' into KSA weights; None or '' means proportional to the bank."""
+    if not spec:
+        return None
+    weights = {}
+    for part in spec.split(','):
+        ksa, _, weight = part.partition(':')
+        if ksa.strip() and weight.strip():
+            weights[ksa.strip().upper()] = float(weight)
+    return weights or None
+
+
+def allocate(quotas: Sequence[float], capacities: Sequence[int], total: int, rng) -> List[int]:
+    """Turn fractional quotas into integer counts that sum to total.
+
+    Each stratum gets the floor of its quota, and the leftover slots go to
+    strata with probability equal to their fractional parts (systematic
+    sampling), so expected counts match the quotas. Counts never exceed a
+    stratum's capacity; quota that doesn't fit is passed on to strata that
+    still have room.
+    """
+    counts = [0] * len(quotas)
+    remaining = min(total, sum(capacities))
+    while remaining > 0:
+        open_strata = [i for i in range(len(quotas)) if counts[i] < capacities[i]]
+        weights = {i: quotas[i] for i in open_strata}
+        weight = sum(weights.values())
+        if weight <= 0:
+            weights = {i: 1.0 for i in open_strata}
+            weight = float(len(open_strata))
+        shares = {i: weights[i] / weight * remaining for i in open_strata}
+
+        added = 0
+        fractions = []
+        for i in open_strata:
+            whole = min(int(shares[i]), capacities[i] - counts[i])
+            counts[i] += whole
+            added += whole
+            if counts[i] < capacities[i] and shares[i] > int(shares[i]):
+                fractions.append((i, shares[i] - int(shares[i])))
+
+        extra = remaining - added
+        total_fraction = sum(f for _, f in fractions)
+        if extra > 0 and total_fraction > 0:
+            rng.shuffle(fractions)
+            step = total_fraction / extra
+            point = rng.random() * step
+            cumulative = 0.0
+            for i, fraction in fractions:
+                cumulative += fraction
+                if point < cumulative and added < remaining:
+                    counts[i] += 1
+                    added += 1
+                    point += step
+        if added == 0:
+            # Rounding left nothing to hand out; give a slot to the largest share
+            i = max(open_strata, key=lambda j: shares[j])
+            counts[i] += 1
+            added = 1
+        remaining -= added
+    return counts
+
+
+class StratifiedSampler:
+    """Per-(KSA, regulation category) buckets of question indices."""
+
+    def __init__(self, questions: Sequence[Dict], category_of: Callable[[Dict], Optional[str]]):
+        buckets: Dict[Tuple[str, str], List[int]] = {}
+        for i, question in enumerate(questions):
+            ksa = (question.get('ksa') or '?').upper()
+            category = category_of(question) or UNCATEGORIZED
+            buckets.setdefault((ksa, category), []).append(i)
+        self.strata: List[Tuple[str, str]] = sorted(buckets)
+        self.buckets: List[List[int]] = [buckets[key] for key in self.strata]
+        self.ksa_sizes: Dict[str, int] = {}
+        for (ksa, _), bucket in zip(self.strata, self.buckets):
+            self.ksa_sizes[ksa] = self.ksa_sizes.get(ksa, 0) + len(bucket)
+        self.size = len(questions)
+
+    def quotas(self, num_questions: int, blueprint: Optional[Dict[str, float]] = None) -> List[float]:
+        """Return each stratum's fractional share of a test of this length."""
+        if blueprint:
+            # KSAs missing from the blueprint are not drawn at all
+            ksa_weight = {ksa: blueprint.get(ksa, 0.0) for ksa in self.ksa_sizes}
+            if not any(ksa_weight.values()):
+                ksa_weight = dict(self.ksa_sizes)
+        else:
+            ksa_weight = dict(self.ksa_sizes)
+        total_weight = sum(ksa_weight.values())
+        return [
+            num_questions * ksa_weight[ksa] / total_weight * len(bucket) / self.ksa_sizes[ksa]
+            for (ksa, _), bucket in zip(self.strata, self.buckets)
+        ]
+
+    def sample(self, num_questions: int, blueprint: Optional[Dict[str, float]] = None,
+               rng: Optional[random.Random] = None) -> List[int]:
+        """Draw a shuffled test of question indices that follows the blueprint."""
+        rng = rng or random
+        num_questions = min(num_questions, self.size)
+        if num_questions <= 0:
+            return []
+        counts = allocate(self.quotas(num_questions, blueprint),
+                          [len(b) for b in self.buckets], num_questions, rng)
+        selected: List[int] = []
+        for bucket, count in zip(self.buckets, counts):
+            if count:
+                selected.extend(rng.sample(bucket, count))
+        rng.shuffle(selected)
+        return selected
+
+
+# Adaptive sampling: an unseen question weighs slightly more than one answered
+# once; missed questions and weak KSAs weigh more, mastered ones less
+UNSEEN_WEIGHT = 1.2
+
+
+def question_weight(attempts: int, correct: int) -> float:
+    """Weight of a question the candidate has seen, from its smoothed miss rate."""
+    miss_rate = (attempts - correct + 1) / (attempts + 2)
+    return 0.25 + 1.5 * miss_rate
+
+
+def ksa_factor(stats: Optional[Tuple[int, int]]) -> float:
+    """Multiplier for every question in a KSA, from the candidate's miss rate there."""
+    attempts, correct = stats or (0, 0)
+    miss_rate = (attempts - correct + 1) / (attempts + 2)
+    return 0.5 + 2.0 * miss_rate
+
+
+class FenwickTree:
+    """Binary indexed tree over non-negative weights.
+
+    Supports changing one weight and drawing an index with probability
+    proportional to its weight, both in O(log n).
+    """
+
+    def __init__(self, weights: Sequence[float] = ()):
+        self.weights = list(weights)
+        n = len(self.weights)
+        tree = [0.0] + self.weights
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+        self.total = sum(self.weights)
+
+    def copy(self) -> 'FenwickTree':
+        clone = FenwickTree.__new__(FenwickTree)
+        clone.weights = list(self.weights)
+        clone._tree = list(self._tree)
+        clone._top = self._top
+        clone.total = self.total
+        return clone
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def set(self, index: int, weight: float) -> None:
+        delta = weight - self.weights[index]
+        if not delta:
+            return
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, value: float) -> int:
+        """Return the index whose cumulative weight range contains value."""
+        position = 0
+        step = self._top
+        while step:
+            nxt = position + step
+            if nxt < len(self._tree) and self._tree[nxt] <= value:
+                position = nxt
+                value -= self._tree[nxt]
+            step >>= 1
+        index = min(position, len(self.weights) - 1)
+        if self.weights[index] <= 0:
+            # Rounding drift landed on an exhausted slot; take the nearest live one
+            live = [i for i, w in enumerate(self.weights) if w > 0]
+            index = min(live, key=lambda i: abs(i - index))
+        return index
+
+
+class AdaptiveSampler:
+    """Weighted test sampler that favours a candidate's weak KSAs and unseen questions.
+
+    One Fenwick tree per KSA is built once per bank version with every
+    question at the unseen weight. A test copies the trees, applies the
+    candidate's history as point updates and draws without replacement:
+    O(n) list copies plus O((history + test length) * log n).
+    """
+
+    def __init__(self, questions: Sequence[Dict], keys: Sequence[str]):
+        self.keys = list(keys)
+        self.members: Dict[str, List[int]] = {}
+        self.locations: Dict[str, List[Tuple[str, int]]] = {}
+        for i, question in enumerate(questions):
+            ksa = question.get('ksa') or '?'
+            members = self.members.setdefault(ksa, [])
+            self.locations.setdefault(self.keys[i], []).append((ksa, len(members)))
+            members.append(i)
+        self.ksas = sorted(self.members)
+        self._trees = {ksa: FenwickTree([UNSEEN_WEIGHT] * len(members)) for ksa, members in self.members.items()}
+        self.size = len(questions)
+
+    def sample(self, num_questions: int, question_stats: Dict[str, Tuple[int, int]],
+               ksa_stats: Dict[str, Tuple[int, int]], rng: Optional[random.Random] = None) -> List[int]:
+        rng = rng or random
+        trees = {ksa: tree.copy() for ksa, tree in self._trees.items()}
+        for key, (attempts, correct) in question_stats.items():
+            for ksa, position in self.locations.get(key, ()):
+                trees[ksa].set(position, question_weight(attempts, correct))
+        factors = {ksa: ksa_factor(ksa_stats.get(ksa)) for ksa in self.ksas}
+
+        remaining = {ksa: len(members) for ksa, members in self.members.items()}
+        selected: List[int] = []
+        for _ in range(min(num_questions, self.size)):
+            # Pick a KSA by its weighted total, then a question within it
+            totals = [factors[ksa] * trees[ksa].total if remaining[ksa] else 0.0 for ksa in self.ksas]
+            grand_total = sum(totals)
+            if grand_total <= 0:
+                break
+            point = rng.random() * grand_total
+            chosen = None
+            for ksa, total in zip(self.ksas, totals):
+                if total > 0:
+                    chosen = ksa
+                    if point < total:
+                        break
+                    point -= total
+            tree = trees[chosen]
+            position = tree.find(min(point / factors[chosen], tree.total))
+            selected.append(self.members[chosen][position])
+            tree.set(position, 0.0)
+            remaining[chosen] -= 1
+        return selected
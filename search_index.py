@@ -0,0 +1,171 @@
+"""
+Full-text search over the question bank
+
+An in-memory inverted index over question text, choices, explanations and
+regulation references, ranked with BM25. Single questions can be added,
+removed or replaced without rebuilding the index, so admin edits stay cheap.
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Words, F-tags (f880) and regulation ids (483.10) are single tokens
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:\.[0-9]+)*')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were which with'.split()
+)
+
+# Term frequency multipliers for each part of a question
+FIELD_WEIGHTS = (
+    ('question', 3),
+    ('choices', 1),
+    ('explanation', 1),
+    ('regulations', 4),
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+def _question_fields(question: Dict) -> Dict[str, str]:
+    regulations = ' '.join(
+        f"{ref.get('id', '')} {ref.get('section', '')} {ref.get('title', '')}"
+        for ref in question.get('regulations') or []
+    )
+    return {
+        'question': question.get('question') or '',
+        'choices': ' '.join(question.get('choices') or []),
+        'explanation': question.get('explanation') or '',
+        'regulations': regulations,
+    }
+
+
+def question_terms(question: Dict) -> Counter:
+    """Return weighted term frequencies for one question."""
+    terms: Counter = Counter()
+    fields = _question_fields(question)
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(fields[field]):
+            terms[token] += weight
+    return terms
+
+
+class SearchIndex:
+    """Inverted index from term to {question id: weighted term frequency}."""
+
+    def __init__(self, questions: Iterable[Dict] = (), version=None):
+        self.version = version
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._vocabulary: Optional[List[str]] = None
+        self._lock = threading.RLock()
+        for doc_id, question in enumerate(questions):
+            self.add(doc_id, question)
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: int, question: Dict) -> None:
+        with self._lock:
+            if doc_id in self._doc_terms:
+                self.remove(doc_id)
+            terms = question_terms(question)
+            self._doc_terms[doc_id] = terms
+            length = sum(terms.values())
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            for term, freq in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._vocabulary = None
+                postings[doc_id] = freq
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary = None
+
+    update = add
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        """Return the indexed terms a query term matches."""
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        vocabulary = self._vocabulary
+        matches = []
+        i = bisect_left(vocabulary, term)
+        while i < len(vocabulary) and vocabulary[i].startswith(term):
+            matches.append(vocabulary[i])
+            i += 1
+        return matches
+
+    def _query_terms(self, query: str, prefix_last: bool) -> List[List[str]]:
+        # The last query term matches as a prefix so results update while typing
+        tokens = tokenize(query)
+        return [self._expand(t, prefix_last and i == len(tokens) - 1) for i, t in enumerate(tokens)]
+
+    def match(self, query: str, prefix_last: bool = True) -> Set[int]:
+        """Return ids of questions containing every query term.
+
+        A query with no indexable terms (empty, or only stopwords such as
+        "the") filters nothing and matches every question.
+        """
+        with self._lock:
+            query_terms = self._query_terms(query, prefix_last)
+            if not query_terms:
+                return set(self._doc_terms)
+            result: Optional[Set[int]] = None
+            for alternatives in query_terms:
+                ids = set()
+                for term in alternatives:
+                    ids.update(self._postings[term])
+                result = ids if result is None else result & ids
+                if not result:
+                    return set()
+            return result or set()
+
+    def search(self, query: str, limit: Optional[int] = 20, prefix_last: bool = True) -> List[Tuple[int, float]]:
+        """Return (question id, BM25 score) pairs, best first.
+
+        Questions matching any query term are ranked; those matching more
+        (and rarer) terms score higher.
+        """
+        with self._lock:
+            n = len(self._doc_terms)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[int, float] = {}
+            for alternatives in self._query_terms(query, prefix_last):
+                for term in alternatives:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, freq in postings.items():
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return ranked if limit is None else ranked[:limit]
+
+    def stats(self) -> Dict:
+        return {'documents': len(self._doc_terms), 'terms': len(self._postings), 'version': self.version}
@@ -0,0 +1,232 @@
+"""
+Server-side session storage
+
+Keeps Flask session data on the server and puts only a signed, opaque session
+id in the cookie, so the cookie stays the same size however many answers a
+test accumulates. Two stores are provided: an in-process dict with TTL
+eviction (the default for the desktop app) and a SQLite file that can be
+shared between worker processes.
+
+A session is only stored once it holds more than a CSRF token or flash
+messages, e.g. a test in progress or an admin login. Until then those few
+keys travel in a signed cookie, so anonymous visitors and crawlers don't
+fill the store and push out sessions in use. Reading a stored session
+extends its expiry.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer, URLSafeTimedSerializer
+from werkzeug.datastructures import CallbackDict
+
+# Keys that alone don't make a session worth storing on the server
+COOKIE_KEYS = frozenset({'csrf_token', '_flashes'})
+# Prefix of cookies that carry the session data itself rather than an id
+DATA_PREFIX = 'd.'
+
+
+class MemorySessionStore:
+    """In-process session store with sliding TTL and least-recently-used eviction."""
+
+    def __init__(self, ttl: int, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        # Entries are kept in last-use order, so expired ones are at the front
+        while self._entries:
+            sid, (expires, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[sid]
+
+    def get(self, sid: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[sid]
+                return None
+            self._entries[sid] = (now + self.ttl, entry[1])
+            self._entries.move_to_end(sid)
+            return entry[1]
+
+    def set(self, sid: str, data: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[sid] = (now + self.ttl, data)
+            self._entries.move_to_end(sid)
+            self._evict(now)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteSessionStore:
+    """Session store backed by a local SQLite file, shared across processes."""
+
+    SWEEP_EVERY = 100
+    TOUCH_AFTER = 60  # Seconds between expiry updates when a session is only read
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)'
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (e.g. gunicorn workers)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT data, expires FROM sessions WHERE id = ? AND expires > ?', (sid, now)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now + self.ttl - self.TOUCH_AFTER:
+            conn.execute('UPDATE sessions SET expires = ? WHERE id = ?', (now + self.ttl, sid))
+        return row[0]
+
+    def set(self, sid: str, data: str) -> None:
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO sessions(id, data, expires) VALUES (?, ?, ?)',
+                     (sid, data, now + self.ttl))
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+
+    def delete(self, sid: str) -> None:
+        self._connect().execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it was changed.
+
+    sid is None until the session is first stored.
+    """
+
+    def __init__(self, initial: Optional[Dict] = None, sid: Optional[str] = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that stores session data in a server-side store."""
+
+    serializer = TaggedJSONSerializer()
+    salt = 'smqt-session-id'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app) -> Signer:
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _data_serializer(self, app) -> URLSafeTimedSerializer:
+        return URLSafeTimedSerializer(app.secret_key, salt='smqt-session-data', serializer=self.serializer)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        signed = request.cookies.get(self.get_cookie_name(app))
+        if signed and signed.startswith(DATA_PREFIX):
+            try:
+                data = self._data_serializer(app).loads(signed[len(DATA_PREFIX):], max_age=self.store.ttl)
+                return ServerSideSession(data)
+            except BadSignature:
+                pass
+        elif signed:
+            try:
+                sid = self._signer(app).unsign(signed).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    return ServerSideSession(self.serializer.loads(data), sid=sid)
+        return ServerSideSession(new=True)
+
+    def regenerate(self, session) -> None:
+        """Move the session to a new id, e.g. on login, so an id known to someone else can't be elevated."""
+        if session.sid is not None:
+            self.store.delete(session.sid)
+            session.sid = None
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                if session.sid is not None:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if all(key in COOKIE_KEYS for key in session):
+            if session.sid is not None:
+                # Nothing left worth storing (e.g. a finished test was cleared)
+                self.store.delete(session.sid)
+                session.sid = None
+            elif not session.modified:
+                return
+            value = DATA_PREFIX + self._data_serializer(app).dumps(dict(session))
+        else:
+            new_id = session.sid is None
+            if new_id:
+                session.sid = secrets.token_urlsafe(32)
+            elif not session.modified:
+                return  # Reading the session already extended its expiry
+            self.store.set(session.sid, self.serializer.dumps(dict(session)))
+            if not (new_id or session.permanent):
+                return
+            value = self._signer(app).sign(session.sid.encode('ascii')).decode('ascii')
+
+        response.set_cookie(
+            name,
+            value,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
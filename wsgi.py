@@ -0,0 +1,13 @@
+"""
+WSGI entry point for running SMQT Practice Test behind a production server.
+
+Examples:
+    waitress-serve --threads 8 --port 5000 wsgi:app
+    gunicorn --workers 4 --threads 4 --bind 127.0.0.1:5000 wsgi:app
+
+Set SESSION_BACKEND=sqlite when running more than one worker process.
+"""
+
+from app import create_app
+
+app = create_app()